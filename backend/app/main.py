@@ -13,6 +13,8 @@ from app.routers import cy
 from app.routers import sandbox
 from app.routers import code_analysis
 from app.routers import pqc_routes
+from app.services.phishing_service import phishing_service
+from app.services.cy_service import cy_service
 import app.firebase_admin  # Initialize Firebase Admin on startup
 
 app = FastAPI(
@@ -49,6 +51,14 @@ app.include_router(code_analysis.router) # Code Analysis router
 app.include_router(pqc_routes.router) # PQC Lab router
 
 
+@app.on_event("startup")
+async def load_models_in_background():
+    # Phishing models load after the server is up; /phishing/status reports progress
+    phishing_service.start_background_load()
+    # Cy legacy-id migration, keyword index refresh and, when CY_LESSON_SYNC_INTERVAL_SECONDS is set, lesson sync
+    cy_service.start_background_tasks()
+
+
 @app.get("/")
 async def root():
     return {
@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import json
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+from app.auth import verify_firebase_token
 from app.services.cy_service import cy_service
+from app.services.inference_executor import InferenceQueueFull
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/cy", tags=["cy-tutor"])
 
@@ -13,6 +21,9 @@ class KnowledgeDocument(BaseModel):
     content: str
     metadata: Dict[str, Any]
 
+class BulkIngestRequest(BaseModel):
+    documents: List[KnowledgeDocument]
+
 @router.post("/chat")
 async def chat_with_cy(request: ChatRequest):
     """
@@ -21,29 +32,109 @@ async def chat_with_cy(request: ChatRequest):
     """
     try:
         # Retrieve context
-        relevant_docs = cy_service.search_context(request.query)
+        relevant_docs = await cy_service.asearch_context(request.query)
         
-        # Generate response (streaming TODO)
-        response_text = await cy_service.generate_response(request.query, relevant_docs, request.context)
+        # Generate response (streaming variant: /cy/chat/stream)
+        result = await cy_service.answer(request.query, relevant_docs, request.context)
         
         return {
-            "response": response_text,
-            "sources": [{"content": d.page_content[:100], "metadata": d.metadata} for d in relevant_docs]
+            "response": result["response"],
+            "sources": [{"content": d.page_content[:100], "metadata": d.metadata} for d in relevant_docs],
+            "prompt": result["prompt"],
+            "cached": result["cached"]
         }
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Cy is busy, retry shortly", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_with_cy_stream(request: ChatRequest, http_request: Request):
+    """
+    Streaming chat for Cy Tutor, as server-sent events: one `sources` event,
+    then `token` events as the model emits text, then `done` with the prompt
+    size report. Generation is cancelled if the client disconnects.
+    """
+    # Retrieve before streaming starts so overload is still reported as a 503
+    try:
+        relevant_docs = await cy_service.asearch_context(request.query)
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Cy is busy, retry shortly", headers={"Retry-After": "1"})
+
+    sources = [{"content": d.page_content[:100], "metadata": d.metadata} for d in relevant_docs]
+
+    async def events():
+        yield _sse("sources", sources)
+        prompt_report: Dict[str, Any] = {}
+        chunks = cy_service.stream_response(request.query, relevant_docs, request.context, prompt_report=prompt_report)
+        try:
+            async for chunk in chunks:
+                if await http_request.is_disconnected():
+                    logger.info("Cy stream client disconnected; cancelling generation.")
+                    return
+                yield _sse("token", {"text": chunk})
+            yield _sse("done", {"prompt": prompt_report})
+        finally:
+            # Closes the model stream too, whether we finished, the client left or the task was cancelled
+            await chunks.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/ingest")
 async def ingest_knowledge(doc: KnowledgeDocument):
     """
     ingest a document into the knowledge base.
     """
     try:
-        cy_service.add_document(doc.content, doc.metadata)
-        return {"status": "success", "message": "Document ingested"}
+        report = await asyncio.to_thread(cy_service.add_document, doc.content, doc.metadata)
+        return {"status": "success", "message": "Document ingested", "report": report}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/ingest/bulk")
+async def ingest_knowledge_bulk(request: BulkIngestRequest, user=Depends(verify_firebase_token)):
+    """
+    Chunk, deduplicate and embed many documents in batches.
+    Re-sending unchanged documents adds nothing.
+    """
+    try:
+        documents = [(doc.content, doc.metadata) for doc in request.documents]
+        report = await asyncio.to_thread(cy_service.ingestor.ingest, documents)
+        return {"status": "success", "report": report}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/sync/lessons", status_code=202)
+async def sync_lessons(user=Depends(verify_firebase_token)):
+    """
+    Start an incremental sync of Firestore lessons into the knowledge base.
+    Progress and the last report are in /cy/status.
+    """
+    if not cy_service.lesson_sync.start():
+        raise HTTPException(status_code=409, detail="A lesson sync is already running")
+    return {"status": "started"}
+
+@router.get("/status")
+async def get_cy_status():
+    """
+    Retrieval configuration and per-stage latency for Cy.
+    """
+    return {
+        "embedding_model": cy_service.EMBEDDING_MODEL,
+        "llm_available": cy_service.llm is not None,
+        "retrieval": cy_service.retriever.stats(),
+        "response_cache": cy_service.response_cache.stats(),
+        "threat_context": cy_service.threat_context.stats(),
+        "lesson_sync": cy_service.lesson_sync.status
+    }
+
 @router.get("/history")
 async def get_history():
     # Placeholder for chat history
@@ -1,13 +1,33 @@
-from fastapi import APIRouter, HTTPException, Body
+import os
+import json
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Body, File, Form, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from app.services.phishing_service import phishing_service
-from typing import Dict, Any, Optional
+from app.auth import verify_firebase_token
+from app.services.phishing_service import phishing_service, phishing_executor
+from app.services.inference_executor import InferenceQueueFull
+from app.services.mail_ingest import count_mbox_messages, iter_mbox_messages, iter_record_batches, result_lines
+from typing import Dict, Any, List, Optional
 
 router = APIRouter(prefix="/phishing", tags=["Phishing Analyzer"])
 
+MAX_EMAIL_LENGTH = 50000
+MAX_BATCH_EMAILS = 100
+MAX_MAILBOX_BYTES = 50 * 1024 * 1024
+MAX_MAILBOX_MESSAGES = 5000
+# Attempts per mailbox batch while the inference queue is full (about 5 s of backoff in total)
+MAX_BULK_ATTEMPTS = 8
+
 class PhishingRequest(BaseModel):
-    email_text: str = Field(..., max_length=50000, description="The text of the email or message to analyze")
+    email_text: str = Field(..., max_length=MAX_EMAIL_LENGTH, description="The text of the email or message to analyze")
+    strip_html: bool = Field(True, description="Whether to strip HTML tags before analysis")
+    include_timings: bool = Field(False, description="Include per-stage durations in the response")
+
+class PhishingBatchRequest(BaseModel):
+    emails: List[str] = Field(..., description=f"Up to {MAX_BATCH_EMAILS} email texts to analyze in one call")
     strip_html: bool = Field(True, description="Whether to strip HTML tags before analysis")
+    include_timings: bool = Field(False, description="Include per-stage durations in each result")
 
 @router.post("/analyze")
 async def analyze_phishing(request: PhishingRequest = Body(...)):
@@ -18,22 +38,178 @@ async def analyze_phishing(request: PhishingRequest = Body(...)):
         raise HTTPException(status_code=400, detail="email_text cannot be empty")
         
     try:
-        result = phishing_service.analyze_email(request.email_text, strip_html=request.strip_html)
+        result = await phishing_executor.run(
+            phishing_service.analyze_email, request.email_text,
+            strip_html=request.strip_html, include_timings=request.include_timings
+        )
         return result
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Phishing analyzer is busy, retry shortly", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal analysis error: {str(e)}")
 
+@router.post("/analyze/batch")
+async def analyze_phishing_batch(request: PhishingBatchRequest = Body(...)):
+    """
+    Analyze several emails in one call. Results are returned in the same order
+    as the submitted emails.
+    """
+    if not request.emails:
+        raise HTTPException(status_code=400, detail="emails cannot be empty")
+    if len(request.emails) > MAX_BATCH_EMAILS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_EMAILS} emails per batch")
+    for index, email_text in enumerate(request.emails):
+        if not email_text.strip():
+            raise HTTPException(status_code=400, detail=f"emails[{index}] cannot be empty")
+        if len(email_text) > MAX_EMAIL_LENGTH:
+            raise HTTPException(status_code=413, detail=f"emails[{index}] exceeds {MAX_EMAIL_LENGTH} characters")
+
+    try:
+        results = await phishing_executor.run(
+            phishing_service.analyze_batch, request.emails,
+            strip_html=request.strip_html, include_timings=request.include_timings
+        )
+        return {"count": len(results), "results": results}
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Phishing analyzer is busy, retry shortly", headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal analysis error: {str(e)}")
+
+async def _analyze_bulk_batch(texts: List[str], strip_html: bool) -> List[Dict[str, Any]]:
+    # Bulk jobs ride out short bursts, but give up (InferenceQueueFull) rather than hold out interactive requests
+    delay = 0.05
+    for attempt in range(MAX_BULK_ATTEMPTS):
+        try:
+            return await phishing_executor.run(phishing_service.analyze_batch, texts, strip_html=strip_html)
+        except InferenceQueueFull:
+            if attempt == MAX_BULK_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+@router.post("/analyze/mbox")
+async def analyze_mailbox(file: UploadFile = File(..., description="An mbox archive or a single .eml message"),
+                          strip_html: bool = Form(True), user=Depends(verify_firebase_token)):
+    """
+    Score every message in an uploaded mbox (or a single .eml). Messages are
+    parsed one at a time and scored in batches; results stream back as NDJSON,
+    one line per message, as each batch finishes. If the analyzer stays busy,
+    the stream ends with an error line for the messages left unscored.
+    """
+    size = await asyncio.to_thread(file.file.seek, 0, os.SEEK_END)
+    if size > MAX_MAILBOX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Mailbox exceeds {MAX_MAILBOX_BYTES} bytes")
+    file.file.seek(0)
+    count = await asyncio.to_thread(count_mbox_messages, file.file)
+    if count > MAX_MAILBOX_MESSAGES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_MAILBOX_MESSAGES} messages per mailbox")
+    file.file.seek(0)
+
+    batches = iter_record_batches(
+        (f"{file.filename}#{number}", message) for number, message in enumerate(iter_mbox_messages(file.file))
+    )
+
+    async def stream_results():
+        while True:
+            # Parsing reads the upload from disk, so keep it off the event loop
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            try:
+                results = await _analyze_bulk_batch([record["text"] for record in batch], strip_html)
+            except InferenceQueueFull:
+                yield json.dumps({"error": "Phishing analyzer is busy; the remaining messages were not analyzed"}) + "\n"
+                break
+            except Exception as e:
+                results = [{"error": f"Internal analysis error: {str(e)}"}] * len(batch)
+            for line in result_lines(batch, results):
+                yield json.dumps(line) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@router.get("/ready")
+async def get_readiness():
+    """
+    Readiness probe: 200 once model loading has finished, 503 while it is in progress.
+    """
+    if not phishing_service.models_loaded:
+        raise HTTPException(status_code=503, detail="Phishing models are still loading")
+    return {"ready": True, "model_version": phishing_service.model_version}
+
 @router.get("/status")
 async def get_model_status():
     """
     Check the current status of the phishing analyzer model.
     """
+    bundle = phishing_service.bundle
+    if phishing_service.loading or not phishing_service.models_loaded:
+        model_status = "loading"
+    else:
+        model_status = "placeholder" if bundle.placeholder_mode else "production"
+    load_seconds = None
+    if phishing_service.load_started_at and phishing_service.load_finished_at:
+        load_seconds = round(phishing_service.load_finished_at - phishing_service.load_started_at, 3)
+
     return {
-        "model_status": "placeholder" if phishing_service.placeholder_mode else "production",
+        "model_status": model_status,
+        "ready": phishing_service.models_loaded,
+        "model_version": bundle.model_version,
+        "load_seconds": load_seconds,
         "models_available": {
-            "tfidf": phishing_service.vectorizer is not None,
-            "logreg": phishing_service.logreg is not None,
-            "svm": phishing_service.svm is not None,
-            "distilbert": phishing_service.bert_model is not None
+            "tfidf": bundle.vectorizer is not None,
+            "logreg": bundle.logreg is not None,
+            "svm": bundle.svm is not None,
+            "distilbert": bundle.bert_model is not None
+        },
+        "models": bundle.load_status,
+        "distilbert_backend": bundle.bert_backend,
+        "model_activation": phishing_service.activation,
+        "inference_queue": phishing_executor.stats(),
+        "bert_microbatch": bundle.bert_batcher.stats() if bundle.bert_batcher else None,
+        "result_cache": phishing_service.result_cache.stats(),
+        "url_features": phishing_service.url_features.stats(),
+        "stage_latency": phishing_service.stage_metrics.snapshot(),
+        "cascade": {
+            "enabled": phishing_service.CASCADE_ENABLED,
+            "uncertainty_band": [phishing_service.CASCADE_LOW, phishing_service.CASCADE_HIGH],
+            **phishing_service.cascade_stats
         }
     }
+
+@router.get("/models")
+async def list_model_versions():
+    """
+    List the model versions in the registry, the active one and the one a rollback would restore.
+    """
+    previous = phishing_service.previous_bundle
+    return {
+        "available": phishing_service.registry.available(),
+        "active": phishing_service.bundle.describe(),
+        "previous": previous.describe() if previous else phishing_service.previous_version,
+        "activation": phishing_service.activation
+    }
+
+@router.post("/models/{version}/activate", status_code=202)
+async def activate_model_version(version: str, user=Depends(verify_firebase_token)):
+    """
+    Load a model version in the background, warm it up and swap it in.
+    The current version keeps serving until the swap; poll /phishing/models for progress.
+    """
+    try:
+        started = phishing_service.start_activation(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version '{version}'")
+    if not started:
+        raise HTTPException(status_code=409, detail="A model load is already in progress")
+    return {"message": f"Activating model version '{version}'", "active": phishing_service.model_version}
+
+@router.post("/models/rollback")
+async def rollback_model_version(user=Depends(verify_firebase_token)):
+    """
+    Revert to the previously active model version.
+    """
+    try:
+        await asyncio.to_thread(phishing_service.rollback)
+    except LookupError:
+        raise HTTPException(status_code=409, detail="No previous model version to roll back to")
+    return {"active": phishing_service.bundle.describe(), "activation": phishing_service.activation}
@@ -5,6 +5,8 @@ from datetime import datetime, timezone
 from typing import List, Dict, Any
 from app.auth import verify_firebase_token
 from app.middleware.rate_limit import limiter
+from app.services.phishing_service import phishing_service
+from app.services.cy_service import cy_service
 import json, hashlib, logging, time
 
 import aiohttp
@@ -346,6 +348,7 @@ async def refresh_threats(
 
         added_count = 0
         skipped_count = 0
+        added_threats = []
 
         for threat in new_threats:
             indicators = threat.get("indicators", [])
@@ -385,8 +388,15 @@ async def refresh_threats(
                 doc_ref.set({"occurrences": 1}, merge=True)
 
             existing_hashes.add(threat_key)
+            added_threats.append(threat)
             added_count += 1
 
+        # New malicious URLs/IPs feed the phishing analyzer's URL reputation
+        if added_threats:
+            phishing_service.add_threat_indicators(added_threats)
+            # Cy's threats-path context is rebuilt from Firestore on the next chat
+            cy_service.threat_context.invalidate()
+
         return {
             "success": True,
             "message": f"Fetched {len(new_threats)} threats, added {added_count} new, skipped {skipped_count} duplicates",
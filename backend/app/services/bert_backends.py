@@ -0,0 +1,135 @@
+import os
+import shutil
+import logging
+import tempfile
+from types import SimpleNamespace
+from typing import Any, Tuple
+import torch
+from transformers import AutoModelForSequenceClassification
+from app.services.shared_weights import load_torch_mmap
+
+try:
+    import onnxruntime as ort
+except ImportError:  # optional dependency, only needed for the "onnx" backend
+    ort = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "int8", "onnx")
+ONNX_FILENAME = "model.onnx"
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization of every Linear layer (weights int8, activations fp32)."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export_onnx(model: torch.nn.Module, tokenizer: Any, onnx_path: str) -> None:
+    """Export a sequence classifier to ONNX with dynamic batch and sequence axes."""
+    sample = tokenizer(["export sample"], return_tensors="pt", padding=True)
+    # Export into a scratch directory under the final name: the exporter may
+    # write an external weights file whose name is recorded inside the graph.
+    target_dir = os.path.dirname(onnx_path)
+    tmp_dir = tempfile.mkdtemp(prefix=".onnx-export-", dir=target_dir)
+    tmp_path = os.path.join(tmp_dir, os.path.basename(onnx_path))
+    try:
+        _run_onnx_export(model, sample, tmp_path)
+        for name in os.listdir(tmp_dir):
+            if name != os.path.basename(onnx_path):
+                os.replace(os.path.join(tmp_dir, name), os.path.join(target_dir, name))
+        os.replace(tmp_path, onnx_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _run_onnx_export(model: torch.nn.Module, sample: Any, path: str) -> None:
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"]),
+        path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"}
+        },
+        opset_version=14
+    )
+
+
+class OnnxSequenceClassifier:
+    """
+    Runs an exported classifier through onnxruntime on CPU.
+    Called like the HuggingFace model and returns an object with `.logits`,
+    so scoring code does not need to know which backend is active.
+    """
+
+    def __init__(self, onnx_path: str, num_threads: int = 0):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, input_ids=None, attention_mask=None, **_unused):
+        logits = self.session.run(
+            ["logits"],
+            {
+                "input_ids": input_ids.numpy().astype("int64"),
+                "attention_mask": attention_mask.numpy().astype("int64")
+            }
+        )[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+    def eval(self):
+        return self
+
+
+def load_bert_backend(backend: str, model_dir: str, tokenizer: Any, onnx_path: str = None,
+                      mmap_weights: bool = False) -> Tuple[Any, str]:
+    """
+    Load the DistilBERT classifier for the requested backend.
+    Returns (model, backend actually in use); falls back to fp32 torch when the
+    requested backend is unknown or cannot be prepared. With `mmap_weights`
+    the fp32 torch weights are memory-mapped and shared between processes.
+    """
+    backend = (backend or "torch").lower()
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown DistilBERT backend '{backend}', using torch.")
+        backend = "torch"
+
+    if backend == "onnx":
+        onnx_path = onnx_path or os.path.join(model_dir, ONNX_FILENAME)
+        if ort is None:
+            logger.warning("onnxruntime is not installed, falling back to the torch backend.")
+        else:
+            try:
+                if not os.path.exists(onnx_path):
+                    logger.info(f"Exporting DistilBERT to ONNX at {onnx_path}")
+                    fp32_model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+                    fp32_model.eval()
+                    export_onnx(fp32_model, tokenizer, onnx_path)
+                    del fp32_model
+                num_threads = int(os.getenv("PHISHING_ONNX_THREADS", "0"))
+                return OnnxSequenceClassifier(onnx_path, num_threads=num_threads), "onnx"
+            except Exception as e:
+                logger.warning(f"ONNX backend unavailable ({str(e)}), falling back to torch.")
+
+    if backend == "torch" and mmap_weights:
+        try:
+            return load_torch_mmap(model_dir), "torch"
+        except Exception as e:
+            logger.warning(f"Memory-mapped DistilBERT weights unavailable ({str(e)}), loading a private copy.")
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+    if backend == "int8":
+        if mmap_weights:
+            logger.info("int8 quantization creates private weights; PHISHING_MODEL_MMAP does not apply to DistilBERT.")
+        try:
+            return quantize_int8(model), "int8"
+        except Exception as e:
+            logger.warning(f"int8 quantization failed ({str(e)}), using fp32 torch.")
+    return model, "torch"
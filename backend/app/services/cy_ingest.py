@@ -0,0 +1,271 @@
+import os
+import re
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Chunk size in embedding-model tokens; all-MiniLM-L6-v2 truncates input at 256
+CHUNK_TOKENS = int(os.getenv("CY_CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP = int(os.getenv("CY_CHUNK_OVERLAP", "40"))
+# Chunks embedded and written per vector store call
+INGEST_BATCH_SIZE = int(os.getenv("CY_INGEST_BATCH_SIZE", "64"))
+
+# Markdown and text already extracted from PDFs
+TEXT_EXTENSIONS = {".md", ".markdown", ".txt"}
+
+_WORD_RE = re.compile(r"\S+")
+_HEADING_RE = re.compile(r"^\s*#+\s*(.+?)\s*$", re.MULTILINE)
+
+
+class TokenTextSplitter:
+    """
+    Splits text into windows of `chunk_tokens` tokens that overlap by
+    `overlap` tokens. Token boundaries come from the embedding model's
+    tokenizer, so a chunk never exceeds what the model reads. Each chunk is
+    cut from the original text using token offsets, which keeps its case and
+    whitespace. Without a fast tokenizer, whitespace-separated words are
+    counted instead.
+    """
+
+    def __init__(self, tokenizer=None, chunk_tokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP):
+        if overlap >= chunk_tokens:
+            raise ValueError("overlap must be smaller than chunk_tokens")
+        self.tokenizer = tokenizer if getattr(tokenizer, "is_fast", False) else None
+        self.chunk_tokens = chunk_tokens
+        self.overlap = overlap
+
+    def _token_spans(self, text: str) -> List[Tuple[int, int]]:
+        if self.tokenizer is None:
+            return [m.span() for m in _WORD_RE.finditer(text)]
+        encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return [tuple(span) for span in encoded["offset_mapping"]]
+
+    def split(self, text: str) -> List[str]:
+        spans = self._token_spans(text)
+        if not spans:
+            return []
+        chunks = []
+        step = self.chunk_tokens - self.overlap
+        for start in range(0, len(spans), step):
+            window = spans[start:start + self.chunk_tokens]
+            chunks.append(text[window[0][0]:window[-1][1]])
+            if start + self.chunk_tokens >= len(spans):
+                break
+        return chunks
+
+
+def chunk_id(source: str, chunk: str) -> str:
+    """Content-hash id: the same chunk from the same source always maps to the same id."""
+    return hashlib.sha256(f"{source}\n{chunk}".encode("utf-8")).hexdigest()[:32]
+
+
+def document_source(content: str, metadata: Dict[str, Any]) -> str:
+    """
+    A document's identity: its explicit `source` metadata, else a hash of its
+    text. Titles are not unique, so they never identify a document.
+    """
+    return str(metadata.get("source") or hashlib.sha256(content.encode("utf-8")).hexdigest()[:16])
+
+
+def _title_for(text: str, path: Path) -> str:
+    match = _HEADING_RE.search(text)
+    return match.group(1) if match else path.stem.replace("_", " ").replace("-", " ").title()
+
+
+def iter_directory_documents(root: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (text, metadata) for each markdown/text file under `root`, one file in memory at a time."""
+    root_path = Path(root)
+    for path in sorted(root_path.rglob("*")):
+        if not path.is_file() or path.suffix.lower() not in TEXT_EXTENSIONS:
+            continue
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError as e:
+            logger.warning(f"Skipping {path}: {str(e)}")
+            continue
+        relative = path.relative_to(root_path).as_posix()
+        yield text, {"title": _title_for(text, path), "type": "document", "source": relative}
+
+
+class IngestProgress:
+    """Running totals for an ingestion run."""
+
+    def __init__(self):
+        self.documents = 0
+        self.chunks = 0
+        self.added = 0
+        self.skipped = 0
+        self.removed = 0
+        self.started = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "documents": self.documents,
+            "chunks": self.chunks,
+            "added": self.added,
+            "skipped_unchanged": self.skipped,
+            "removed_stale": self.removed,
+            "elapsed_seconds": round(elapsed, 2),
+            "chunks_per_second": round(self.chunks / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+class CyIngestor:
+    """
+    Bulk ingestion into Cy's vector store.
+
+    Documents are split into token chunks. Each chunk gets a content-hash id,
+    and ids already in the collection are skipped before anything is
+    embedded, so re-ingesting unchanged material costs only an id lookup.
+    New chunks are embedded and written `batch_size` at a time. For a
+    document with an explicit `source`, stored chunks of that source that
+    the new version no longer produces are deleted, so editing it replaces
+    it instead of adding to it. A document without one is identified by its
+    text and is only ever added. Writes and deletes are mirrored into
+    `keyword_index` when one is given.
+    """
+
+    def __init__(self, vector_store, splitter: TokenTextSplitter, batch_size: int = INGEST_BATCH_SIZE,
+                 keyword_index=None):
+        self.vector_store = vector_store
+        self.splitter = splitter
+        self.batch_size = batch_size
+        self.keyword_index = keyword_index
+
+    def _chunks(self, documents: Iterable[Tuple[str, Dict[str, Any]]], progress: IngestProgress,
+                sources: Dict[str, set]) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        for content, metadata in documents:
+            progress.documents += 1
+            source = document_source(content, metadata)
+            # Only an explicit source is known to name the same document across runs
+            current = sources.setdefault(source, set()) if metadata.get("source") else set()
+            pieces = self.splitter.split(content)
+            for index, piece in enumerate(pieces):
+                chunk_metadata = dict(metadata)
+                chunk_metadata.update({"source": source, "chunk_index": index, "chunk_count": len(pieces)})
+                piece_id = chunk_id(source, piece)
+                current.add(piece_id)
+                yield piece_id, piece, chunk_metadata
+
+    def _write_batch(self, batch: List[Tuple[str, str, Dict[str, Any]]], progress: IngestProgress) -> None:
+        ids = [item[0] for item in batch]
+        existing = set(self.vector_store._collection.get(ids=ids, include=[])["ids"])
+        new_items = [item for item in batch if item[0] not in existing]
+        if new_items:
+            # add_texts embeds the whole batch in one embed_documents call
+            new_ids, texts, metadatas = zip(*new_items)
+            self.vector_store.add_texts(texts=list(texts), metadatas=list(metadatas), ids=list(new_ids))
+            if self.keyword_index is not None:
+                self.keyword_index.add(new_ids, texts)
+        progress.chunks += len(batch)
+        progress.added += len(new_items)
+        progress.skipped += len(batch) - len(new_items)
+
+    def _remove_stale(self, sources: Dict[str, set]) -> int:
+        """Delete stored chunks of `sources` that are not among their current chunk ids."""
+        removed = 0
+        for source, current in sources.items():
+            stored = self.vector_store._collection.get(where={"source": source}, include=[])["ids"]
+            stale = [doc_id for doc_id in stored if doc_id not in current]
+            if stale:
+                self.delete(stale)
+                removed += len(stale)
+        return removed
+
+    def delete(self, ids: List[str]) -> None:
+        """Remove chunks from the vector store (and keyword index)."""
+        self.vector_store._collection.delete(ids=ids)
+        if self.keyword_index is not None:
+            self.keyword_index.remove(ids)
+
+    def update_metadata(self, ids: List[str], changes: Dict[str, Any]) -> None:
+        """Merge `changes` into the metadata of existing chunks without re-embedding them."""
+        self.vector_store._collection.update(ids=ids, metadatas=[changes] * len(ids))
+
+    def ingest(self, documents: Iterable[Tuple[str, Dict[str, Any]]],
+               on_progress: Optional[Callable[[IngestProgress], None]] = None,
+               replace_stale: bool = True) -> Dict[str, Any]:
+        """
+        Ingest (content, metadata) pairs; `on_progress` is called after every
+        batch. With `replace_stale` False nothing already stored is deleted.
+        """
+        progress = IngestProgress()
+        batch: List[Tuple[str, str, Dict[str, Any]]] = []
+        seen = set()
+        sources: Dict[str, set] = {}
+        for item in self._chunks(documents, progress, sources):
+            # A chunk repeated within this run (e.g. a duplicated file section) is written once
+            if item[0] in seen:
+                progress.chunks += 1
+                progress.skipped += 1
+                continue
+            seen.add(item[0])
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch, progress)
+                batch = []
+                if on_progress is not None:
+                    on_progress(progress)
+        if batch:
+            self._write_batch(batch, progress)
+            if on_progress is not None:
+                on_progress(progress)
+        # New chunks are written before old ones go, so a source is never missing mid-run
+        if replace_stale:
+            progress.removed = self._remove_stale(sources)
+        report = progress.as_dict()
+        logger.info(f"Cy ingestion finished: {report}")
+        return report
+
+    def ingest_directory(self, root: str,
+                         on_progress: Optional[Callable[[IngestProgress], None]] = None) -> Dict[str, Any]:
+        return self.ingest(iter_directory_documents(root), on_progress=on_progress)
+
+    def migrate_legacy(self, page_size: int = 1000) -> Dict[str, int]:
+        """
+        Move documents stored before content-hash ids (random UUIDs, no
+        `chunk_index`) onto the current scheme, so re-ingesting them replaces
+        them instead of duplicating them. A document that still fits in one
+        chunk keeps its stored embedding; a longer one is re-split and
+        re-embedded.
+        """
+        collection = self.vector_store._collection
+        legacy_ids = []
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            legacy_ids.extend(doc_id for doc_id, metadata in zip(page["ids"], page["metadatas"])
+                              if "chunk_index" not in (metadata or {}))
+            offset += len(page["ids"])
+
+        report = {"legacy": len(legacy_ids), "reused_embeddings": 0, "reembedded": 0}
+        for start in range(0, len(legacy_ids), self.batch_size):
+            batch = collection.get(ids=legacy_ids[start:start + self.batch_size],
+                                   include=["documents", "metadatas", "embeddings"])
+            for doc_id, content, metadata, embedding in zip(batch["ids"], batch["documents"],
+                                                            batch["metadatas"], batch["embeddings"]):
+                metadata = dict(metadata or {})
+                pieces = self.splitter.split(content or "")
+                if len(pieces) == 1:
+                    source = document_source(content, metadata)
+                    metadata.update({"source": source, "chunk_index": 0, "chunk_count": 1})
+                    new_id = chunk_id(source, pieces[0])
+                    collection.upsert(ids=[new_id], embeddings=[embedding], documents=[pieces[0]],
+                                      metadatas=[metadata])
+                    if self.keyword_index is not None:
+                        self.keyword_index.add([new_id], [pieces[0]])
+                    report["reused_embeddings"] += 1
+                elif pieces:
+                    # Other legacy chunks of the same source may still be waiting to be migrated
+                    self.ingest([(content, metadata)], replace_stale=False)
+                    report["reembedded"] += 1
+                self.delete([doc_id])
+        logger.info(f"Cy legacy migration finished: {report}")
+        return report
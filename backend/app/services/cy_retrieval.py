@@ -0,0 +1,301 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from app.services.micro_batcher import MicroBatcher
+from app.services.metrics import StageMetrics
+from app.services.inference_executor import InferenceExecutor
+from app.services.embedding_cache import EmbeddingCache
+from app.services.keyword_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+# HNSW index parameters (defaults match Chroma's own). space, M and
+# construction_ef are fixed when a collection is created; search_ef can be
+# changed on an existing collection and trades recall for query latency.
+HNSW_SPACE = os.getenv("CY_HNSW_SPACE", "l2")
+HNSW_M = int(os.getenv("CY_HNSW_M", "16"))
+HNSW_CONSTRUCTION_EF = int(os.getenv("CY_HNSW_CONSTRUCTION_EF", "100"))
+HNSW_SEARCH_EF = int(os.getenv("CY_HNSW_SEARCH_EF", "100"))
+
+# Concurrent chat queries are embedded together in one forward pass
+EMBED_BATCH_SIZE = int(os.getenv("CY_EMBED_BATCH_SIZE", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("CY_EMBED_MAX_WAIT_MS", "5"))
+
+# Hybrid retrieval: vector and BM25 candidates merged with reciprocal-rank fusion
+HYBRID_CANDIDATES = int(os.getenv("CY_HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("CY_RRF_K", "60"))
+
+# Optional cross-encoder re-ranking of the fused candidates (e.g. cross-encoder/ms-marco-MiniLM-L-6-v2)
+RERANK_MODEL = os.getenv("CY_RERANK_MODEL", "")
+RERANK_CANDIDATES = int(os.getenv("CY_RERANK_CANDIDATES", "10"))
+RERANK_BUDGET_MS = float(os.getenv("CY_RERANK_BUDGET_MS", "150"))
+
+
+def hnsw_collection_metadata() -> Dict[str, Any]:
+    """Chroma collection metadata carrying the configured HNSW parameters."""
+    return {
+        "hnsw:space": HNSW_SPACE,
+        "hnsw:M": HNSW_M,
+        "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+        "hnsw:search_ef": HNSW_SEARCH_EF,
+    }
+
+
+def apply_hnsw_settings(collection) -> None:
+    """
+    Bring an existing collection in line with the configured HNSW parameters
+    where Chroma allows it. search_ef is updated in place; build-time
+    parameters only take effect when the collection is re-created, so a
+    mismatch is logged rather than silently ignored.
+    """
+    configuration = getattr(collection, "configuration", None) or {}
+    hnsw = configuration.get("hnsw") or {}
+    built = {
+        "hnsw:space": hnsw.get("space"),
+        "hnsw:M": hnsw.get("max_neighbors"),
+        "hnsw:construction_ef": hnsw.get("ef_construction"),
+    }
+    wanted = hnsw_collection_metadata()
+    for key, value in built.items():
+        if value is not None and value != wanted[key]:
+            logger.warning(f"Collection {collection.name} was built with {key}={value}; re-create it to apply {wanted[key]}.")
+
+    if hnsw and hnsw.get("ef_search") != HNSW_SEARCH_EF:
+        try:
+            collection.modify(configuration={"hnsw": {"ef_search": HNSW_SEARCH_EF}})
+            logger.info(f"Set ef_search={HNSW_SEARCH_EF} on collection {collection.name}.")
+        except Exception as e:
+            logger.warning(f"Could not update ef_search on collection {collection.name}: {str(e)}")
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Merge ranked id lists: each list adds 1 / (k + rank) to an id's score."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores (query, chunk) pairs with a small CPU cross-encoder within a
+    latency budget. Scoring runs on its own single worker. If it does not
+    finish within the budget, or the worker is still busy with a previous
+    request, callers keep the fused order instead of waiting.
+    """
+
+    def __init__(self, model_name: str, budget_ms: float = RERANK_BUDGET_MS):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.model = None
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cy-rerank")
+        self._busy = threading.Lock()
+        self.skipped = 0
+        self.timeouts = 0
+
+    def _load(self):
+        if self.model is None:
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(self.model_name, device="cpu")
+            logger.info(f"Loaded re-ranker {self.model_name}.")
+        return self.model
+
+    def _score(self, query: str, docs: List[Document]) -> List[float]:
+        pairs = [(query, d.page_content) for d in docs]
+        return [float(s) for s in self._load().predict(pairs, show_progress_bar=False)]
+
+    def submit(self, query: str, docs: List[Document]):
+        """Future of the scores, or None when the worker is busy (re-ranking skipped)."""
+        if not self._busy.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        try:
+            future = self._worker.submit(self._score, query, docs)
+        except Exception:
+            self._busy.release()
+            raise
+        # Also runs if the future is cancelled before it starts (e.g. by asyncio.wait_for)
+        future.add_done_callback(lambda _: self._busy.release())
+        return future
+
+    @staticmethod
+    def order(docs: List[Document], scores: List[float]) -> List[Document]:
+        return [doc for _, doc in sorted(zip(scores, docs), key=lambda pair: pair[0], reverse=True)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "loaded": self.model is not None,
+            "budget_ms": self.budget_ms,
+            "skipped_busy": self.skipped,
+            "timeouts": self.timeouts,
+        }
+
+
+class CyRetriever:
+    """
+    Vector retrieval for Cy.
+
+    Query embedding goes through a MicroBatcher, so concurrent chats share one
+    embedding forward pass, and the vector search runs on a bounded
+    InferenceExecutor; the async path never blocks the event loop. Repeat
+    queries are answered from `embedding_cache` without a forward pass.
+
+    With a `keyword_index`, vector and BM25 candidates are merged by
+    reciprocal-rank fusion, so exact terms (CVE ids, tool flags, algorithm
+    names) are found even when embeddings miss them. A `reranker` then
+    re-orders the top fused candidates if it fits its latency budget.
+    Per-stage latency (embed, search, keyword, fuse, rerank, total) is kept
+    in StageMetrics.
+    """
+
+    def __init__(self, vector_store, embedding_function, executor: InferenceExecutor,
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 keyword_index: Optional[BM25Index] = None,
+                 reranker: Optional[CrossEncoderReranker] = None):
+        self.vector_store = vector_store
+        self.embedding_function = embedding_function
+        self.executor = executor
+        self.embedding_cache = embedding_cache
+        self.keyword_index = keyword_index
+        self.reranker = reranker
+        self.embed_batcher = MicroBatcher(
+            "cy-embed",
+            self._embed_queries,
+            max_batch_size=EMBED_BATCH_SIZE,
+            max_wait_ms=EMBED_MAX_WAIT_MS
+        )
+        self.stage_metrics = StageMetrics()
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        # Runs on the batcher thread, which keeps the embedding cache's SQLite
+        # reads and writes off the event loop
+        cache = self.embedding_cache
+        embeddings = [cache.load(query) if cache is not None else None for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            # embed_documents encodes the whole list at once; with no query-specific
+            # encode kwargs it gives the same vectors as embed_query
+            vectors = self.embedding_function.embed_documents([queries[i] for i in missing])
+            for i, vector in zip(missing, vectors):
+                embeddings[i] = vector
+                if cache is not None:
+                    cache.set(queries[i], vector)
+        return embeddings
+
+    def _search_by_vector(self, embedding: List[float], k: int) -> List[Document]:
+        start = time.perf_counter()
+        # Query the collection directly so documents carry their Chroma ids
+        results = self.vector_store._collection.query(
+            query_embeddings=[embedding], n_results=k, include=["documents", "metadatas"]
+        )
+        docs = [
+            Document(id=doc_id, page_content=content, metadata=metadata or {})
+            for doc_id, content, metadata in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+        ]
+        self.stage_metrics.observe("search", (time.perf_counter() - start) * 1000)
+        return docs
+
+    def _cached_embedding(self, query: str) -> Optional[List[float]]:
+        return self.embedding_cache.get(query) if self.embedding_cache is not None else None
+
+    def _candidates(self, query: str, embedding: List[float], k: int) -> List[Document]:
+        """Vector results, or with a keyword index the RRF merge of vector and BM25 candidates."""
+        if self.keyword_index is None:
+            return self._search_by_vector(embedding, k)
+
+        n = max(k, HYBRID_CANDIDATES, RERANK_CANDIDATES if self.reranker is not None else 0)
+        vector_docs = self._search_by_vector(embedding, n)
+        start = time.perf_counter()
+        keyword_hits = self.keyword_index.search(query, n)
+        self.stage_metrics.observe("keyword", (time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        by_id = {doc.id: doc for doc in vector_docs}
+        fused = [doc_id for doc_id, _ in reciprocal_rank_fusion(
+            [[doc.id for doc in vector_docs], [doc_id for doc_id, _ in keyword_hits]])[:n]]
+        keyword_only = [doc_id for doc_id in fused if doc_id not in by_id]
+        if keyword_only:
+            # Read keyword-only hits from the store: this process's index may still hold
+            # chunks another worker has since deleted or replaced
+            stored = self.vector_store._collection.get(ids=keyword_only, include=["documents", "metadatas"])
+            for doc_id, content, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                by_id[doc_id] = Document(id=doc_id, page_content=content, metadata=metadata or {})
+            self.keyword_index.remove(set(keyword_only) - set(stored["ids"]))
+        docs = [by_id[doc_id] for doc_id in fused if doc_id in by_id]
+        self.stage_metrics.observe("fuse", (time.perf_counter() - start) * 1000)
+        return docs
+
+    def _rerank_input(self, docs: List[Document], k: int) -> Optional[List[Document]]:
+        if self.reranker is None or len(docs) <= 1:
+            return None
+        return docs[:max(k, RERANK_CANDIDATES)]
+
+    def search(self, query: str, k: int = 3) -> List[Document]:
+        """Blocking retrieval, for scripts and other synchronous callers."""
+        start = time.perf_counter()
+        embedding = self._cached_embedding(query)
+        if embedding is None:
+            embedding = self.embed_batcher.submit(query).result()
+        self.stage_metrics.observe("embed", (time.perf_counter() - start) * 1000)
+        docs = self._candidates(query, embedding, k)
+        candidates = self._rerank_input(docs, k)
+        if candidates is not None:
+            rerank_start = time.perf_counter()
+            future = self.reranker.submit(query, candidates)
+            if future is not None:
+                try:
+                    docs = self.reranker.order(candidates, future.result(timeout=self.reranker.budget_ms / 1000))
+                except FutureTimeoutError:
+                    self.reranker.timeouts += 1
+            self.stage_metrics.observe("rerank", (time.perf_counter() - rerank_start) * 1000)
+        self.stage_metrics.observe("total", (time.perf_counter() - start) * 1000)
+        return docs[:k]
+
+    async def aembed(self, query: str) -> List[float]:
+        """Query embedding, from the cache when possible, without blocking the event loop."""
+        # Only the in-memory cache is checked here; persisted entries are read on the batcher thread
+        embedding = self._cached_embedding(query)
+        if embedding is None:
+            embedding = await asyncio.wrap_future(self.embed_batcher.submit(query))
+        return embedding
+
+    async def asearch(self, query: str, k: int = 3) -> List[Document]:
+        """
+        Retrieval from async routes. Raises InferenceQueueFull when the search
+        executor is saturated.
+        """
+        start = time.perf_counter()
+        embedding = await self.aembed(query)
+        self.stage_metrics.observe("embed", (time.perf_counter() - start) * 1000)
+        docs = await self.executor.run(self._candidates, query, embedding, k)
+        candidates = self._rerank_input(docs, k)
+        if candidates is not None:
+            rerank_start = time.perf_counter()
+            future = self.reranker.submit(query, candidates)
+            if future is not None:
+                try:
+                    scores = await asyncio.wait_for(asyncio.wrap_future(future), self.reranker.budget_ms / 1000)
+                    docs = self.reranker.order(candidates, scores)
+                except asyncio.TimeoutError:
+                    self.reranker.timeouts += 1
+            self.stage_metrics.observe("rerank", (time.perf_counter() - rerank_start) * 1000)
+        self.stage_metrics.observe("total", (time.perf_counter() - start) * 1000)
+        return docs[:k]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hnsw": hnsw_collection_metadata(),
+            "embed_microbatch": self.embed_batcher.stats(),
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache is not None else None,
+            "keyword_index": self.keyword_index.stats() if self.keyword_index is not None else None,
+            "reranker": self.reranker.stats() if self.reranker is not None else None,
+            "search_queue": self.executor.stats(),
+            "latency": self.stage_metrics.snapshot(),
+        }
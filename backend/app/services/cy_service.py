@@ -1,6 +1,8 @@
 import os
+import asyncio
+import threading
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.documents import Document
@@ -8,6 +10,17 @@ from langchain_community.vectorstores import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from firebase_admin import firestore as fb_firestore
 from dotenv import load_dotenv
+from app.services.cy_retrieval import (
+    CyRetriever, CrossEncoderReranker, hnsw_collection_metadata, apply_hnsw_settings, RERANK_MODEL
+)
+from app.services.keyword_index import BM25Index
+from app.services.embedding_cache import EmbeddingCache
+from app.services.response_cache import SemanticResponseCache
+from app.services.threat_context import ThreatContextCache, ThreatContextSnapshot
+from app.services.cy_ingest import CyIngestor, TokenTextSplitter, CHUNK_TOKENS, CHUNK_OVERLAP
+from app.services.lesson_sync import LessonSync
+from app.services.prompt_budget import PromptBudget, count_tokens
+from app.services.inference_executor import retrieval_executor, InferenceQueueFull
 
 load_dotenv()
 
@@ -18,18 +31,80 @@ logger = logging.getLogger(__name__)
 class CyService:
     # ... (init methods)
 
+    EMBEDDING_MODEL = os.getenv("CY_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+    # BM25 keyword search alongside vector search (set CY_HYBRID_SEARCH=0 for vector only)
+    HYBRID_SEARCH = os.getenv("CY_HYBRID_SEARCH", "1").lower() in ("1", "true", "yes")
+
+    # Query embedding cache; set CY_EMBED_CACHE_PATH (e.g. app/data/cy_embedding_cache.sqlite3)
+    # to keep it across restarts
+    EMBED_CACHE_SIZE = int(os.getenv("CY_EMBED_CACHE_SIZE", "10000"))
+    EMBED_CACHE_PATH = os.getenv("CY_EMBED_CACHE_PATH", "")
+
+    # Answers reused for near-duplicate questions with the same path, sources and threat data
+    RESPONSE_CACHE_SIZE = int(os.getenv("CY_RESPONSE_CACHE_SIZE", "2000"))
+    RESPONSE_CACHE_THRESHOLD = float(os.getenv("CY_RESPONSE_CACHE_THRESHOLD", "0.95"))
+    RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("CY_RESPONSE_CACHE_TTL_SECONDS", "3600"))
+
+    # Threat data for the threats dashboard path, rebuilt on refresh or after the TTL
+    THREAT_CONTEXT_TTL_SECONDS = float(os.getenv("CY_THREAT_CONTEXT_TTL_SECONDS", "300"))
+    THREAT_CONTEXT_MAX_TOKENS = int(os.getenv("CY_THREAT_CONTEXT_MAX_TOKENS", "4000"))
+    THREAT_CONTEXT_FETCH_LIMIT = 100
+
+    LLM_ERROR_MESSAGE = "I'm having trouble connecting to my brain (LLM) right now. Please check your API key or internet connection."
+
     def __init__(self):
         if getattr(self, "initialized", False):
             return
             
         self.persist_directory = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cy_vector_db")
-        self.embedding_function = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        self.embedding_function = HuggingFaceEmbeddings(model_name=self.EMBEDDING_MODEL)
         
-        # Initialize ChromaDB
+        # Initialize ChromaDB (HNSW parameters apply when the collection is first created)
         self.vector_store = Chroma(
             persist_directory=self.persist_directory,
             embedding_function=self.embedding_function,
-            collection_name="codelife_knowledge_base"
+            collection_name="codelife_knowledge_base",
+            collection_metadata=hnsw_collection_metadata()
+        )
+        apply_hnsw_settings(self.vector_store._collection)
+        encoder = getattr(self.embedding_function, "_client", None)
+        tokenizer = getattr(encoder, "tokenizer", None)
+        self.embedding_cache = EmbeddingCache(
+            self.EMBEDDING_MODEL,
+            max_entries=self.EMBED_CACHE_SIZE,
+            persist_path=self.EMBED_CACHE_PATH,
+            # Case-insensitive cache keys only when the model itself ignores case
+            lowercase=bool(getattr(tokenizer, "do_lower_case", False))
+        )
+        self.keyword_index = None
+        if self.HYBRID_SEARCH:
+            self.keyword_index = BM25Index()
+            self.keyword_index.build_from_collection(self.vector_store._collection)
+        self.retriever = CyRetriever(
+            self.vector_store, self.embedding_function, retrieval_executor,
+            embedding_cache=self.embedding_cache,
+            keyword_index=self.keyword_index,
+            reranker=CrossEncoderReranker(RERANK_MODEL) if RERANK_MODEL else None
+        )
+        # Chunks are sized in the embedding model's own tokens, within what it reads
+        max_tokens = (getattr(encoder, "max_seq_length", None) or CHUNK_TOKENS + 2) - 2
+        self.ingestor = CyIngestor(
+            self.vector_store,
+            TokenTextSplitter(tokenizer, min(CHUNK_TOKENS, max_tokens), CHUNK_OVERLAP),
+            keyword_index=self.keyword_index
+        )
+        self.lesson_sync = LessonSync(self.vector_store, self.ingestor, lock_dir=os.path.dirname(self.persist_directory))
+        self.prompt_budget = PromptBudget()
+        self.response_cache = SemanticResponseCache(
+            self.RESPONSE_CACHE_SIZE,
+            threshold=self.RESPONSE_CACHE_THRESHOLD,
+            ttl_seconds=self.RESPONSE_CACHE_TTL_SECONDS
+        )
+        self.threat_context = ThreatContextCache(
+            self._fetch_all_threats,
+            ttl_seconds=self.THREAT_CONTEXT_TTL_SECONDS,
+            max_tokens=self.THREAT_CONTEXT_MAX_TOKENS
         )
         
         # Initialize Gemini LLM
@@ -48,41 +123,47 @@ class CyService:
         self.initialized = True
         logger.info(f"CyService initialized with Vector DB at {self.persist_directory}")
 
-    def _fetch_all_threats(self) -> str:
-        """Fetch ALL threat intelligence from Firestore and format as context string."""
+    def start_background_tasks(self) -> None:
+        """Legacy-id migration, periodic BM25 refresh and lesson sync (each per its interval setting)."""
+        # Idempotent and cheap once done, so every worker may run it
+        threading.Thread(target=self._migrate_legacy, name="cy-legacy-migration", daemon=True).start()
+        if self.keyword_index is not None:
+            self.keyword_index.start_periodic_refresh(self.vector_store._collection)
+        self.lesson_sync.start_periodic()
+
+    def _migrate_legacy(self) -> None:
         try:
-            db = fb_firestore.client()
-            threats_ref = db.collection('threatIntelligence').order_by(
-                'timestamp', direction=fb_firestore.Query.DESCENDING
-            ).limit(100)
-            docs = threats_ref.stream()
-            
-            threat_lines = []
-            for doc in docs:
-                data = doc.to_dict()
-                severity = data.get("severity", "Unknown")
-                source = data.get("source", "Unknown")
-                ttype = data.get("type", "Unknown")
-                desc = data.get("description", "No description")
-                indicators = ", ".join(data.get("indicators", [])[:5])
-                threat_lines.append(f"- [{severity}] ({source}) {ttype}: {desc} | Indicators: {indicators}")
-            
-            if not threat_lines:
-                return "No threat intelligence data available yet. Suggest the user click 'Refresh Live Feeds' on the dashboard."
-            
-            return "\n".join(threat_lines)
+            self.ingestor.migrate_legacy()
         except Exception as e:
-            logger.warning(f"Failed to fetch threats for Cy context: {e}")
-            return "Unable to load current threat data."
+            logger.warning(f"Cy legacy document migration failed: {str(e)}")
 
-    def add_document(self, content: str, metadata: Dict[str, Any]):
+    def _fetch_all_threats(self) -> List[Dict[str, Any]]:
+        """Fetch the latest threat intelligence from Firestore, newest first (blocking)."""
+        db = fb_firestore.client()
+        threats_ref = db.collection('threatIntelligence').order_by(
+            'timestamp', direction=fb_firestore.Query.DESCENDING
+        ).limit(self.THREAT_CONTEXT_FETCH_LIMIT)
+        return [doc.to_dict() for doc in threats_ref.stream()]
+
+    async def _threat_snapshot(self, user_context: Dict[str, Any]) -> Optional[ThreatContextSnapshot]:
+        """Threat context for the threats dashboard path; None on other paths."""
+        if not user_context or "threats" not in user_context.get('path', 'Unknown'):
+            return None
+        snapshot = self.threat_context.current()
+        if snapshot is None:
+            # Rebuilding reads Firestore, so keep it off the event loop
+            snapshot = await asyncio.to_thread(self.threat_context.get)
+        return snapshot
+
+    def add_document(self, content: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Add a document to the knowledge base.
+        Add a document to the knowledge base (chunked; unchanged chunks are skipped).
+        Nothing already stored is removed: this backs the unauthenticated /ingest.
         """
         try:
-            doc = Document(page_content=content, metadata=metadata)
-            self.vector_store.add_documents([doc])
-            logger.info(f"Added document: {metadata.get('title', 'Untitled')}")
+            report = self.ingestor.ingest([(content, metadata)], replace_stale=False)
+            logger.info(f"Added document: {metadata.get('title', 'Untitled')} ({report['added']} new chunks)")
+            return report
         except Exception as e:
             logger.error(f"Error adding document: {str(e)}")
             raise
@@ -92,17 +173,35 @@ class CyService:
         Retrieve relevant context for a query.
         """
         try:
-            return self.vector_store.similarity_search(query, k=k)
+            return self.retriever.search(query, k=k)
         except Exception as e:
             logger.error(f"Error searching context: {str(e)}")
             return []
 
-    async def generate_response(self, query: str, context_docs: List[Document], user_context: Dict[str, Any]) -> str:
+    async def asearch_context(self, query: str, k: int = 3) -> List[Document]:
         """
-        Generate a response using Gemini 1.5 Flash.
-        Enforces 'Tutor Policy': Guide, don't solve.
+        Retrieve relevant context without blocking the event loop.
+        Raises InferenceQueueFull when retrieval is saturated.
+        """
+        try:
+            return await self.retriever.asearch(query, k=k)
+        except InferenceQueueFull:
+            raise
+        except Exception as e:
+            logger.error(f"Error searching context: {str(e)}")
+            return []
+
+    def _build_messages(self, query: str, context_docs: List[Document], user_context: Dict[str, Any],
+                        threat_snapshot: Optional[ThreatContextSnapshot] = None):
+        """
+        Prompt messages for a chat turn, fitted to the prompt token budget.
+        Returns the messages, a version string for any prompt context beyond
+        the path and retrieved documents (the threat snapshot), so cached
+        answers are never reused across threat snapshots, and a report of
+        the prompt's size.
         """
-        context_text = "\n\n".join([d.page_content for d in context_docs])
+        context_version = ""
+        threat_text = None
         
         system_prompt = """You are Cy, an expert AI Cybersecurity Tutor for the CodeLife platform. 
 Your goal is to help students learn by guiding them, NOT by giving direct answers or flags.
@@ -120,27 +219,114 @@ Current User Context:
             system_prompt += f"\n- Current Path: {path}"
             if "pqc-lab" in path:
                 system_prompt += "\n- Context Note: The user is currently in the Post-Quantum Cryptography Lab. Your explanations should cover Shor's Algorithm, NIST standards (like CRYSTALS-Kyber/Dilithium), lattice-based concepts, and key size tradeoffs."
-            if "threats" in path:
-                threat_context = self._fetch_all_threats()
-                system_prompt += f"\n- Context Note: The user is on the Threat Intelligence Dashboard. Below is ALL current threat intelligence data from our OSINT feeds. Use this to answer questions about current threats, severity levels, attack patterns, and indicators of compromise.\n\n--- LIVE THREAT INTELLIGENCE ---\n{threat_context}\n--- END THREAT INTELLIGENCE ---"
-        
-        user_message = f"""Course Material:
+            if "threats" in path and threat_snapshot is not None:
+                context_version = threat_snapshot.version
+                threat_text = threat_snapshot.text
+                system_prompt += "\n- Context Note: The user is on the Threat Intelligence Dashboard. Below is the most recent threat intelligence data from our OSINT feeds. Use this to answer questions about current threats, severity levels, attack patterns, and indicators of compromise.\n\n--- LIVE THREAT INTELLIGENCE ---\n{threat_context}\n--- END THREAT INTELLIGENCE ---"
+
+        user_template = """Course Material:
 {context_text}
 
 Student Question: 
 {query}
 """
-        
+        # Everything except the question, material and threat data is fixed overhead
+        instructions = system_prompt.replace("{threat_context}", "") + user_template.format(context_text="", query="")
+        question, material, threat_text, report = self.prompt_budget.fit(
+            instructions, query, [d.page_content for d in context_docs], threat_text
+        )
+        if threat_text is not None:
+            system_prompt = system_prompt.replace("{threat_context}", threat_text)
+        user_message = user_template.format(context_text="\n\n".join(material), query=question)
+
+        messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=user_message)
+        ]
+        report["total_tokens"] = count_tokens(system_prompt) + count_tokens(user_message)
+        return messages, context_version, report
+
+    async def _cached_response(self, query: str, context_docs: List[Document], user_context: Dict[str, Any],
+                               context_version: str):
+        """(cached answer or None, cache scope, query embedding); scope is None when caching is off."""
+        if not self.response_cache.enabled:
+            return None, None, None
+        path = (user_context or {}).get('path', '')
+        cache_scope = self.response_cache.scope(path, context_docs, context_version)
+        embedding = await self.retriever.aembed(query)
+        return self.response_cache.get(cache_scope, embedding), cache_scope, embedding
+
+    async def answer(self, query: str, context_docs: List[Document], user_context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Generate a response using Gemini, with a report of the prompt sent.
+        Enforces 'Tutor Policy': Guide, don't solve.
+        Near-duplicate questions are answered from the semantic response cache.
+        """
+        report = None
         try:
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_message)
-            ]
+            threat_snapshot = await self._threat_snapshot(user_context)
+            messages, context_version, report = self._build_messages(query, context_docs, user_context, threat_snapshot)
+            cached, cache_scope, embedding = await self._cached_response(query, context_docs, user_context, context_version)
+            if cached is not None:
+                return {"response": cached, "prompt": report, "cached": True}
+
             response = await self.llm.ainvoke(messages)
-            return response.content
+            if cache_scope is not None:
+                self.response_cache.set(cache_scope, embedding, response.content)
+            return {"response": response.content, "prompt": report, "cached": False}
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            return {"response": self.LLM_ERROR_MESSAGE, "prompt": report, "cached": False}
+
+    async def generate_response(self, query: str, context_docs: List[Document], user_context: Dict[str, Any]) -> str:
+        """
+        Generate a response using Gemini 1.5 Flash.
+        Enforces 'Tutor Policy': Guide, don't solve.
+        """
+        return (await self.answer(query, context_docs, user_context))["response"]
+
+    async def stream_response(self, query: str, context_docs: List[Document], user_context: Dict[str, Any],
+                              prompt_report: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Like generate_response, but yields text chunks as Gemini emits them.
+        Closing the iterator early (client gone) closes the model stream, which
+        cancels the generation; only complete answers are cached. If given,
+        `prompt_report` is filled in with the prompt size report.
+        """
+        try:
+            threat_snapshot = await self._threat_snapshot(user_context)
+            messages, context_version, report = self._build_messages(query, context_docs, user_context, threat_snapshot)
+            if prompt_report is not None:
+                prompt_report.update(report)
+            cached, cache_scope, embedding = await self._cached_response(query, context_docs, user_context, context_version)
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}")
-            return "I'm having trouble connecting to my brain (LLM) right now. Please check your API key or internet connection."
+            yield self.LLM_ERROR_MESSAGE
+            return
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        stream = None
+        try:
+            stream = self.llm.astream(messages)
+            async for chunk in stream:
+                # .text flattens Gemini's content blocks into plain text
+                text = chunk.text
+                if text:
+                    chunks.append(text)
+                    yield text
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            if not chunks:
+                yield self.LLM_ERROR_MESSAGE
+            return
+        finally:
+            if stream is not None:
+                await stream.aclose()
+        if cache_scope is not None:
+            self.response_cache.set(cache_scope, embedding, "".join(chunks))
 
 # Global instance
 cy_service = CyService()
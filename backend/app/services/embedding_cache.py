@@ -0,0 +1,145 @@
+import re
+import time
+import array
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from app.services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str, lowercase: bool = False) -> str:
+    """
+    Cache key text: trimmed and whitespace collapsed. With `lowercase` (only
+    for uncased models, whose tokenizer lowercases input anyway) it is also
+    lowercased the way the tokenizer does it, so "XSS" and "xss" share an entry.
+    """
+    key = _WHITESPACE_RE.sub(" ", query).strip()
+    return key.lower() if lowercase else key
+
+
+class EmbeddingCache:
+    """
+    Query embedding cache for one embedding model.
+
+    Lookups hit an in-memory LRUCache first. With `persist_path` set, vectors
+    are also written to a SQLite file so the cache survives restarts; rows
+    recorded for a different model (or key normalization) are deleted when
+    the file is opened, so changing the embedding model invalidates the
+    cache. `get` never touches SQLite; `load` and `set` do and block, so
+    call them off the event loop.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 10000,
+                 persist_path: Optional[str] = None, max_persisted: int = 100000,
+                 lowercase: bool = False):
+        self.model_name = model_name
+        self.lowercase = lowercase
+        # Rows are tagged with the key normalization too, so toggling it drops them
+        self._model_key = f"{model_name}:lowercase" if lowercase else model_name
+        self.memory = LRUCache(max_entries)
+        self.persist_path = persist_path or None
+        self.max_persisted = max_persisted
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._disk_hits = 0
+        self._writes = 0
+        if self.persist_path:
+            self._open(self.persist_path)
+
+    def _open(self, path: str):
+        try:
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (model, query))"
+            )
+            stale = db.execute("DELETE FROM query_embeddings WHERE model != ?", (self._model_key,)).rowcount
+            db.commit()
+            if stale:
+                logger.info(f"Dropped {stale} cached embeddings from a previous embedding model.")
+            self._db = db
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache persistence disabled ({path}): {str(e)}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory.enabled or self._db is not None
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """In-memory lookup only; cheap enough for the event loop."""
+        return self.memory.get(normalize_query(query, self.lowercase))
+
+    def load(self, query: str) -> Optional[List[float]]:
+        """SQLite lookup after a `get` miss (blocking); a hit is copied into memory."""
+        if self._db is None:
+            return None
+        key = normalize_query(query, self.lowercase)
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT vector FROM query_embeddings WHERE model = ? AND query = ?", (self._model_key, key)
+            ).fetchone()
+            if row is None:
+                return None
+            self._disk_hits += 1
+        vector = array.array("f", row[0]).tolist()
+        self.memory.set(key, vector)
+        return vector
+
+    def set(self, query: str, vector: List[float]) -> None:
+        key = normalize_query(query, self.lowercase)
+        self.memory.set(key, vector)
+        if self._db is None:
+            return
+        # Vectors are float32 already, so storing them as float32 loses nothing
+        blob = array.array("f", vector).tobytes()
+        with self._db_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (model, query, vector, created_at) VALUES (?, ?, ?, ?)",
+                    (self._model_key, key, blob, time.time())
+                )
+                self._writes += 1
+                if self._writes % 1000 == 0:
+                    self._prune()
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist query embedding: {str(e)}")
+
+    def _prune(self):
+        """Keep only the newest max_persisted rows."""
+        self._db.execute(
+            "DELETE FROM query_embeddings WHERE rowid IN ("
+            "SELECT rowid FROM query_embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_persisted,)
+        )
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        # Memory misses that were found on disk count as hits overall
+        hits = memory["hits"] + self._disk_hits
+        lookups = memory["hits"] + memory["misses"]
+        persisted = None
+        if self._db is not None:
+            with self._db_lock:
+                persisted = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+        return {
+            "model": self.model_name,
+            "lowercase": self.lowercase,
+            "memory": memory,
+            "disk_hits": self._disk_hits,
+            "persisted_entries": persisted,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
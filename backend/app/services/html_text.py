@@ -0,0 +1,55 @@
+from html.parser import HTMLParser
+from typing import List, Tuple
+
+# Text inside these elements is not visible content (matches BeautifulSoup's get_text)
+SKIPPED_ELEMENTS = {"script", "style", "template"}
+LINK_ATTRIBUTES = {"a": "href", "area": "href"}
+
+
+class HTMLTextExtractor(HTMLParser):
+    """
+    Streaming tag stripper. Collects text nodes without building a document
+    tree and records link targets, which get_text() would otherwise drop.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.links: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_ELEMENTS:
+            self._skip_depth += 1
+            return
+        link_attr = LINK_ATTRIBUTES.get(tag)
+        if link_attr:
+            for name, value in attrs:
+                if name == link_attr and value:
+                    self.links.append(value.strip())
+
+    def handle_startendtag(self, tag, attrs):
+        # <script/> and friends open nothing, so only record links
+        if tag not in SKIPPED_ELEMENTS:
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_ELEMENTS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def unknown_decl(self, data):
+        # <![CDATA[...]]> content counts as text
+        if data.startswith("CDATA[") and not self._skip_depth:
+            self.parts.append(data[len("CDATA["):])
+
+
+def html_to_text(markup: str) -> Tuple[str, List[str]]:
+    """Return (visible text, link targets) for an HTML document or fragment."""
+    parser = HTMLTextExtractor()
+    parser.feed(markup)
+    parser.close()
+    return "".join(parser.parts), parser.links
@@ -0,0 +1,85 @@
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the executor already holds its maximum number of jobs."""
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for blocking model inference.
+
+    Async routes await `run(...)` so HTML parsing, sklearn and torch work happen
+    off the event loop. At most `max_workers + max_queue_depth` jobs are admitted
+    at once; anything beyond that is rejected with InferenceQueueFull so callers
+    can shed load instead of queueing without limit.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue_depth: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_depth)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._admitted -= 1
+            self._completed += 1
+        self._slots.release()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` on the pool and await its result."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise InferenceQueueFull(f"{self.name} queue is full")
+
+        with self._lock:
+            self._admitted += 1
+        try:
+            future = self._executor.submit(partial(fn, *args, **kwargs))
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is released when the job finishes, even if the awaiting
+        # request is cancelled, so the queue depth reflects real work.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            admitted = self._admitted
+            completed = self._completed
+            rejected = self._rejected
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "running": min(admitted, self.max_workers),
+            "queued": max(0, admitted - self.max_workers),
+            "completed": completed,
+            "rejected": rejected
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+# Global instance used for Cy vector search
+retrieval_executor = InferenceExecutor(
+    name="cy-retrieval",
+    max_workers=int(os.getenv("CY_RETRIEVAL_WORKERS", "4")),
+    max_queue_depth=int(os.getenv("CY_RETRIEVAL_QUEUE_DEPTH", "64"))
+)
@@ -0,0 +1,144 @@
+import os
+import re
+import math
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rebuild from the vector store every N seconds to pick up other workers' writes; 0 disables
+REFRESH_INTERVAL_SECONDS = float(os.getenv("CY_KEYWORD_INDEX_REFRESH_SECONDS", "300"))
+
+# Words, numbers and compound terms such as "cve-2024-3094", "ml-dsa-44", "-ss" or "x.509"
+_TERM_RE = re.compile(r"-{0,2}[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_SPLIT_RE = re.compile(r"[-_./]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms for BM25. A compound term is kept whole (so exact CVE
+    ids and tool flags match exactly) and also contributes its parts, so
+    "ML-DSA" still matches "ML-DSA-44".
+    """
+    terms = []
+    for term in _TERM_RE.findall(text.lower()):
+        terms.append(term)
+        parts = [p for p in _SPLIT_RE.split(term) if p]
+        if len(parts) > 1 or (parts and parts[0] != term):
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 scoring over Cy's chunks.
+
+    It indexes the vector store's chunk text under the same chunk ids. It is
+    built from the collection at startup, updated by this process's
+    ingestion pipeline and rebuilt periodically to pick up writes made by
+    other worker processes. Hits are ids only; callers read the chunks from
+    the store, so the index being briefly behind never returns stale text.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._docs: Dict[str, str] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self._docs:
+                    self._remove(doc_id)
+                counts = Counter(tokenize(text))
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[doc_id] = tf
+                length = sum(counts.values())
+                self._lengths[doc_id] = length
+                self._total_length += length
+                self._docs[doc_id] = text
+
+    def _remove(self, doc_id: str) -> None:
+        text = self._docs.pop(doc_id)
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id, 0)
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self._docs:
+                    self._remove(doc_id)
+
+    def build_from_collection(self, collection, page_size: int = 1000) -> int:
+        """Index every chunk in a Chroma collection, a page at a time. Returns the number indexed."""
+        offset = 0
+        while True:
+            page = collection.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.add(page["ids"], page["documents"])
+            offset += len(page["ids"])
+        logger.info(f"BM25 index built over {len(self)} chunks.")
+        return len(self)
+
+    def rebuild_from_collection(self, collection, page_size: int = 1000) -> int:
+        """Replace the index with a fresh build from `collection`; searches keep using the old one meanwhile."""
+        fresh = BM25Index(self.k1, self.b)
+        fresh.build_from_collection(collection, page_size)
+        with self._lock:
+            self._postings, self._lengths = fresh._postings, fresh._lengths
+            self._docs, self._total_length = fresh._docs, fresh._total_length
+        return len(self)
+
+    def start_periodic_refresh(self, collection, interval_seconds: float = REFRESH_INTERVAL_SECONDS) -> bool:
+        """Rebuild every `interval_seconds` on a daemon thread; no-op when the interval is 0."""
+        if interval_seconds <= 0:
+            return False
+
+        def loop():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    self.rebuild_from_collection(collection)
+                except Exception as e:
+                    logger.warning(f"BM25 index refresh failed: {str(e)}")
+
+        threading.Thread(target=loop, name="cy-keyword-refresh", daemon=True).start()
+        return True
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top `k` (chunk id, BM25 score) pairs for `query`."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._docs)
+            if not n or not terms:
+                return []
+            avg_length = self._total_length / n
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"chunks": len(self._docs), "terms": len(self._postings)}
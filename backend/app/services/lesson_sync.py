@@ -0,0 +1,237 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from app.services.cy_ingest import CyIngestor
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, so a single worker process is assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LESSON_DOC_TYPE = "lesson"
+LESSON_SOURCE_PREFIX = "lesson:"
+
+# Run a sync every N seconds after startup; 0 leaves it to the CLI and the endpoint
+SYNC_INTERVAL_SECONDS = float(os.getenv("CY_LESSON_SYNC_INTERVAL_SECONDS", "0"))
+
+# (course_id, course data, lesson_id, lesson data)
+LessonRecord = Tuple[str, Dict[str, Any], str, Dict[str, Any]]
+
+
+def iter_firestore_lessons() -> Iterator[LessonRecord]:
+    """Every lesson of every course in Firestore (blocking)."""
+    from firebase_admin import firestore as fb_firestore
+
+    db = fb_firestore.client()
+    for course in db.collection("courses").stream():
+        course_data = course.to_dict() or {}
+        for lesson in course.reference.collection("lessons").stream():
+            yield course.id, course_data, lesson.id, lesson.to_dict() or {}
+
+
+def lesson_source(course_id: str, lesson_id: str) -> str:
+    return f"{LESSON_SOURCE_PREFIX}{course_id}/{lesson_id}"
+
+
+def lesson_text(course: Dict[str, Any], lesson: Dict[str, Any]) -> str:
+    """
+    What Cy indexes for a lesson: its content, articles and quiz questions
+    with explanations. Which option is correct is left out, so retrieved
+    context never hands over quiz answers.
+    """
+    parts = [f"# {lesson.get('title') or 'Untitled lesson'}"]
+    if course.get("title"):
+        parts.append(f"Course: {course['title']}")
+    if lesson.get("content"):
+        parts.append(str(lesson["content"]))
+    for article in lesson.get("articles") or []:
+        parts.append(f"## {article.get('title', 'Article')}\n{article.get('content', '')}")
+    for quiz in lesson.get("quizzes") or []:
+        question = f"Quiz question: {quiz.get('question', '')}"
+        if quiz.get("explanation"):
+            question += f"\nExplanation: {quiz['explanation']}"
+        parts.append(question)
+    return "\n\n".join(parts)
+
+
+class _ProcessLock:
+    """
+    Non-blocking exclusive lock on a file, shared by every worker process on
+    this host. The OS releases it when the holder exits. Without a path (or
+    without fcntl) it always succeeds.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> bool:
+        if self.path is None or fcntl is None:
+            return True
+        handle = open(self.path, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._file = handle
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _timestamp(value: Any) -> str:
+    if value is None:
+        return ""
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+class LessonSync:
+    """
+    Incremental sync of Firestore lessons into Cy's vector store.
+
+    Chunks of a lesson carry its content hash and `updated_at` in their
+    metadata, so the store itself records what was indexed. A run re-embeds
+    only lessons whose hash changed (a newer `updated_at` with the same text
+    just refreshes metadata) and deletes chunks of lessons that are gone
+    from Firestore.
+
+    With `lock_dir`, lock files there make a sync run in one worker process
+    at a time, and only one process runs the periodic schedule.
+    """
+
+    def __init__(self, vector_store, ingestor: CyIngestor,
+                 fetch_lessons: Callable[[], Iterable[LessonRecord]] = iter_firestore_lessons,
+                 lock_dir: Optional[str] = None):
+        self.vector_store = vector_store
+        self.ingestor = ingestor
+        self.fetch_lessons = fetch_lessons
+        self._lock = threading.Lock()
+        self._run_lock = _ProcessLock(os.path.join(lock_dir, "cy_lesson_sync.lock") if lock_dir else None)
+        self._schedule_lock = _ProcessLock(os.path.join(lock_dir, "cy_lesson_sync.schedule") if lock_dir else None)
+        self.status: Dict[str, Any] = {"state": "idle", "last_report": None, "last_error": None, "finished_at": None}
+
+    def _content_hash(self, text: str) -> str:
+        # Chunking settings are part of the hash, so changing them re-indexes every lesson
+        splitter = self.ingestor.splitter
+        return hashlib.sha256(f"{splitter.chunk_tokens}:{splitter.overlap}\n{text}".encode("utf-8")).hexdigest()
+
+    def _indexed_lessons(self) -> Dict[str, Dict[str, Any]]:
+        """source -> {"ids", "content_hash", "updated_at"} for lessons already in the store."""
+        stored = self.vector_store._collection.get(where={"type": LESSON_DOC_TYPE}, include=["metadatas"])
+        indexed: Dict[str, Dict[str, Any]] = {}
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            metadata = metadata or {}
+            entry = indexed.setdefault(metadata.get("source", ""), {
+                "ids": [], "content_hash": metadata.get("content_hash"), "updated_at": metadata.get("updated_at")
+            })
+            entry["ids"].append(chunk_id)
+        return indexed
+
+    def run(self) -> Dict[str, Any]:
+        """One sync pass (blocking). Returns counts of what changed."""
+        start = time.perf_counter()
+        indexed = self._indexed_lessons()
+        report = {"lessons": 0, "unchanged": 0, "metadata_only": 0, "reindexed": 0, "added": 0,
+                  "removed": 0, "chunks_added": 0}
+        seen = set()
+
+        for course_id, course, lesson_id, lesson in self.fetch_lessons():
+            report["lessons"] += 1
+            source = lesson_source(course_id, lesson_id)
+            seen.add(source)
+            updated_at = _timestamp(lesson.get("updated_at"))
+            previous = indexed.get(source)
+
+            # Always hashed: a course rename or new chunk settings change the hash but not `updated_at`
+            text = lesson_text(course, lesson)
+            content_hash = self._content_hash(text)
+            if previous and previous["content_hash"] == content_hash:
+                if previous["updated_at"] == updated_at:
+                    report["unchanged"] += 1
+                else:
+                    self.ingestor.update_metadata(previous["ids"], {"updated_at": updated_at})
+                    report["metadata_only"] += 1
+                continue
+
+            if previous:
+                self.ingestor.delete(previous["ids"])
+            metadata = {
+                "title": lesson.get("title") or "Untitled lesson",
+                "type": LESSON_DOC_TYPE,
+                "source": source,
+                "course_id": course_id,
+                "lesson_id": lesson_id,
+                "content_hash": content_hash,
+                "updated_at": updated_at,
+            }
+            ingested = self.ingestor.ingest([(text, metadata)])
+            report["chunks_added"] += ingested["added"]
+            report["reindexed" if previous else "added"] += 1
+
+        # Only reached when the whole Firestore scan succeeded, so a failed read never deletes lessons
+        for source, entry in indexed.items():
+            if source not in seen:
+                self.ingestor.delete(entry["ids"])
+                report["removed"] += 1
+
+        report["elapsed_seconds"] = round(time.perf_counter() - start, 2)
+        logger.info(f"Cy lesson sync finished: {report}")
+        return report
+
+    def run_guarded(self) -> Optional[Dict[str, Any]]:
+        """run() unless a sync is already running in any worker (then None); failures are recorded in `status`."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        if not self._run_lock.acquire():
+            self._lock.release()
+            return None
+        try:
+            self.status["state"] = "running"
+            report = self.run()
+            self.status.update(state="idle", last_report=report, last_error=None)
+            return report
+        except Exception as e:
+            logger.error(f"Cy lesson sync failed: {str(e)}")
+            self.status.update(state="failed", last_error=str(e))
+            return None
+        finally:
+            self.status["finished_at"] = time.time()
+            self._run_lock.release()
+            self._lock.release()
+
+    def start(self) -> bool:
+        """Sync on a daemon thread. Returns False if a sync is already running."""
+        if self._lock.locked():
+            return False
+        threading.Thread(target=self.run_guarded, name="cy-lesson-sync", daemon=True).start()
+        return True
+
+    def start_periodic(self, interval_seconds: float = SYNC_INTERVAL_SECONDS) -> bool:
+        """
+        Sync now and then every `interval_seconds` on a daemon thread; no-op
+        when the interval is 0. With several worker processes only the one
+        holding the schedule lock syncs; the others wait to take over if it
+        exits.
+        """
+        if interval_seconds <= 0:
+            return False
+
+        def loop():
+            while not self._schedule_lock.acquire():
+                time.sleep(interval_seconds)
+            while True:
+                self.run_guarded()
+                time.sleep(interval_seconds)
+
+        threading.Thread(target=loop, name="cy-lesson-sync-periodic", daemon=True).start()
+        return True
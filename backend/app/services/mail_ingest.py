@@ -0,0 +1,193 @@
+import os
+import re
+import logging
+from email import policy
+from email.feedparser import BytesFeedParser
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bytes of any single message that are parsed; the rest (usually attachments) is dropped
+MAX_MESSAGE_BYTES = int(os.getenv("PHISHING_MAILBOX_MAX_MESSAGE_BYTES", str(10 * 1024 * 1024)))
+# Messages per analyze_batch call
+BATCH_SIZE = int(os.getenv("PHISHING_MAILBOX_BATCH_SIZE", "32"))
+# Same limit as the JSON analyze endpoint
+MAX_TEXT_LENGTH = 50000
+
+READ_CHUNK_BYTES = 64 * 1024
+MBOX_ESCAPED_FROM = re.compile(rb"^>(>*From )")
+
+
+class _MessageBuilder:
+    """Feeds one message into the incremental MIME parser, up to MAX_MESSAGE_BYTES."""
+
+    def __init__(self):
+        self.parser = BytesFeedParser(policy=policy.default)
+        self.size = 0
+        self.truncated = False
+
+    def feed(self, data: bytes):
+        if self.truncated:
+            return
+        if self.size + len(data) > MAX_MESSAGE_BYTES:
+            self.truncated = True
+            return
+        self.size += len(data)
+        self.parser.feed(data)
+
+    def close(self) -> EmailMessage:
+        if self.truncated:
+            logger.warning(f"Message larger than {MAX_MESSAGE_BYTES} bytes was truncated before parsing")
+        return self.parser.close()
+
+
+def iter_mbox_messages(stream: BinaryIO) -> Iterator[EmailMessage]:
+    """
+    Yield messages from an mbox stream one at a time. Only the message being
+    parsed is held in memory. A stream without "From " separators is treated
+    as a single RFC 822 message, so a bare .eml upload works too.
+    """
+    builder: Optional[_MessageBuilder] = None
+    at_line_start = True
+    while True:
+        # Bounded reads keep a pathological single-line message from being read at once
+        chunk = stream.readline(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        if at_line_start and chunk.startswith(b"From "):
+            if builder is not None and builder.size:
+                yield builder.close()
+            builder = _MessageBuilder()
+        else:
+            if builder is None:
+                builder = _MessageBuilder()
+            if at_line_start:
+                chunk = MBOX_ESCAPED_FROM.sub(rb"\1", chunk)
+            builder.feed(chunk)
+        at_line_start = chunk.endswith(b"\n")
+
+    if builder is not None and builder.size:
+        yield builder.close()
+
+
+def count_mbox_messages(stream: BinaryIO) -> int:
+    """
+    Number of messages iter_mbox_messages would yield for `stream`, found by
+    scanning for "From " separators without parsing anything. Reads the
+    stream to the end.
+    """
+    count = 0
+    pending = False
+    at_line_start = True
+    while True:
+        chunk = stream.readline(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        if at_line_start and chunk.startswith(b"From "):
+            count += pending
+            pending = False
+        else:
+            pending = True
+        at_line_start = chunk.endswith(b"\n")
+    return count + pending
+
+
+def read_eml_file(path: Path) -> EmailMessage:
+    builder = _MessageBuilder()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+            builder.feed(chunk)
+    return builder.close()
+
+
+def iter_mail_sources(paths: Iterable[str]) -> Iterator[Tuple[str, EmailMessage]]:
+    """
+    Yield (source, message) for every message under `paths`. Directories are
+    searched recursively for .eml files; any other file is read as an mbox.
+    """
+    for raw_path in paths:
+        path = Path(raw_path)
+        if path.is_dir():
+            for eml_path in sorted(path.rglob("*.eml")):
+                try:
+                    yield str(eml_path), read_eml_file(eml_path)
+                except OSError as e:
+                    logger.error(f"Failed to read {eml_path}: {str(e)}")
+        else:
+            with open(path, 'rb') as f:
+                for number, message in enumerate(iter_mbox_messages(f)):
+                    yield f"{path}#{number}", message
+
+
+def _header(message: EmailMessage, name: str) -> Optional[str]:
+    try:
+        value = message.get(name)
+    except Exception:
+        # Malformed headers can fail to parse under the default policy
+        return None
+    return str(value) if value is not None else None
+
+
+def _part_text(part: EmailMessage) -> str:
+    try:
+        return part.get_content()
+    except (LookupError, UnicodeError, KeyError, AssertionError):
+        # Unknown charset or broken transfer encoding
+        payload = part.get_payload(decode=True) or b""
+        return payload.decode("utf-8", errors="replace")
+
+
+def message_to_text(message: EmailMessage) -> str:
+    """
+    Text submitted for scoring: the subject plus the message body. HTML bodies
+    are preferred over plain text because PhishingService strips the markup
+    itself and collects hidden link targets from it. Attachments are ignored.
+    """
+    body = ""
+    try:
+        part = message.get_body(preferencelist=("html", "plain"))
+        if part is not None:
+            body = _part_text(part)
+    except Exception as e:
+        logger.warning(f"Could not extract message body: {str(e)}")
+    subject = _header(message, "Subject")
+    text = f"{subject}\n\n{body}" if subject else body
+    return text[:MAX_TEXT_LENGTH]
+
+
+def message_record(source: str, index: int, message: EmailMessage) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "source": source,
+        "message_id": _header(message, "Message-ID"),
+        "from": _header(message, "From"),
+        "subject": _header(message, "Subject"),
+        "date": _header(message, "Date"),
+        "text": message_to_text(message),
+    }
+
+
+def iter_record_batches(messages: Iterable[Tuple[str, EmailMessage]],
+                        batch_size: int = BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Group messages into batches of records ready for analyze_batch. Each
+    record carries the message metadata and its scoring text under "text".
+    """
+    batch: List[Dict[str, Any]] = []
+    for index, (source, message) in enumerate(messages):
+        batch.append(message_record(source, index, message))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def result_lines(batch: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Pair records with their analysis results, dropping the scoring text."""
+    for record, result in zip(batch, results):
+        line = {key: value for key, value in record.items() if key != "text"}
+        line["result"] = result
+        yield line
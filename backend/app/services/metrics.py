@@ -0,0 +1,120 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence
+
+# Upper bounds in milliseconds; observations above the last bound land in +Inf
+DEFAULT_LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """
+    Thread-safe fixed-bucket latency histogram (Prometheus-style cumulative
+    buckets). Percentiles are estimated by interpolating within the bucket
+    that contains them, so memory stays constant however many requests pass.
+    """
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        self.bounds = sorted(buckets_ms)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float) -> None:
+        index = bisect.bisect_left(self.bounds, value_ms)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value_ms
+            if value_ms > self._max:
+                self._max = value_ms
+
+    def _percentile(self, counts, total: int, max_ms: float, q: float) -> float:
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else max_ms
+                return min(max_ms, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return max_ms
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counts = list(self._counts)
+            total, total_ms, max_ms = self._count, self._sum, self._max
+
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.bounds, counts):
+            cumulative += count
+            buckets[f"le_{bound:g}"] = cumulative
+        buckets["le_inf"] = total
+
+        return {
+            "count": total,
+            "sum_ms": round(total_ms, 3),
+            "mean_ms": round(total_ms / total, 3) if total else None,
+            "p50_ms": round(self._percentile(counts, total, max_ms, 0.50), 3) if total else None,
+            "p95_ms": round(self._percentile(counts, total, max_ms, 0.95), 3) if total else None,
+            "p99_ms": round(self._percentile(counts, total, max_ms, 0.99), 3) if total else None,
+            "max_ms": round(max_ms, 3) if total else None,
+            "buckets": buckets,
+        }
+
+
+class StageTimer:
+    """Collects wall-clock durations of named stages for a single call."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.durations_ms: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.durations_ms[name] = self.durations_ms.get(name, 0.0) + elapsed
+
+    def finish(self) -> Dict[str, float]:
+        """Record the total elapsed time and return all durations."""
+        self.durations_ms["total"] = (time.perf_counter() - self.started_at) * 1000
+        return self.durations_ms
+
+    def as_dict(self) -> Dict[str, float]:
+        return {f"{name}_ms": round(ms, 3) for name, ms in self.durations_ms.items()}
+
+
+class StageMetrics:
+    """One LatencyHistogram per stage name, created on first observation."""
+
+    def __init__(self, buckets_ms: Optional[Sequence[float]] = None):
+        self.buckets_ms = buckets_ms or DEFAULT_LATENCY_BUCKETS_MS
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, value_ms: float) -> None:
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, LatencyHistogram(self.buckets_ms))
+        histogram.observe(value_ms)
+
+    def record(self, durations_ms: Dict[str, float]) -> None:
+        for stage, value_ms in durations_ms.items():
+            self.observe(stage, value_ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {stage: histogram.snapshot() for stage, histogram in histograms.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
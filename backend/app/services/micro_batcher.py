@@ -0,0 +1,123 @@
+import queue
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Queued by close() to let the worker exit once earlier items are processed
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-item requests into batches.
+
+    Callers `submit` items from any thread and get a Future back. A background
+    worker waits for the first item, then keeps collecting until either
+    `max_batch_size` items are queued or `max_wait_ms` has passed, runs
+    `process_batch` once over the whole batch and resolves each caller's Future
+    with its own output. `process_batch` must return one output per input, in
+    input order.
+    """
+
+    def __init__(self, name: str, process_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+
+    def _ensure_worker(self) -> None:
+        # Checked under the lock so a worker exiting after close() cannot strand a new item
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        self._queue.put((item, future))
+        self._ensure_worker()
+        return future
+
+    def submit_many(self, items: List[Any]) -> List[Future]:
+        return [self.submit(item) for item in items]
+
+    def close(self) -> None:
+        """
+        Stop the worker after the items already queued are processed, releasing
+        its reference to `process_batch`. A later submit starts a new worker.
+        """
+        with self._lock:
+            if self._worker is not None:
+                self._queue.put((_STOP, None))
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Window closed, but still take whatever is already waiting
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            stop = any(item is _STOP for item, _ in batch)
+            batch = [(item, future) for item, future in batch if item is not _STOP and future.set_running_or_notify_cancel()]
+            if batch:
+                self._process(batch)
+            if stop:
+                with self._lock:
+                    if self._queue.empty():
+                        self._worker = None
+                        return
+
+    def _process(self, batch: List[tuple]) -> None:
+        try:
+            outputs = self.process_batch([item for item, _ in batch])
+            if len(outputs) != len(batch):
+                raise RuntimeError(f"{self.name} batch returned {len(outputs)} results for {len(batch)} inputs")
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+        except Exception as e:
+            logger.error(f"{self.name} micro-batch failed: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._largest_batch = max(self._largest_batch, len(batch))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            batches = self._batches
+            items = self._items
+            largest = self._largest_batch
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": batches,
+            "items": items,
+            "pending": self._queue.qsize(),
+            "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+            "largest_batch": largest,
+            "batch_fill_ratio": round(items / (batches * self.max_batch_size), 4) if batches else 0.0
+        }
@@ -0,0 +1,100 @@
+import os
+import copy
+from typing import Any, Dict, List, Optional
+
+DEFAULT_VERSION = "default"
+
+
+class ModelBundle:
+    """
+    One version of the phishing models and everything loaded from it.
+
+    A bundle is filled in while loading and not modified once published.
+    Requests read the service's active bundle once and use only that object,
+    so replacing the bundle is atomic: in-flight requests finish on the version
+    they started with and new requests see the new one.
+    """
+
+    def __init__(self, name: str, tfidf_path: str, logreg_path: str, svm_path: str,
+                 distilbert_dir: str, onnx_path: Optional[str] = None):
+        self.name = name
+        self.root_dir = os.path.dirname(tfidf_path)
+        self.tfidf_path = tfidf_path
+        self.logreg_path = logreg_path
+        self.svm_path = svm_path
+        self.distilbert_dir = distilbert_dir
+        self.onnx_path = onnx_path or os.path.join(distilbert_dir, "model.onnx")
+
+        self.vectorizer = None
+        self.logreg = None
+        self.svm = None
+        self.tokenizer = None
+        self.bert_model = None
+        self.bert_batcher = None
+        self.bert_backend = None
+        self.classic_ready = False
+        self.bert_ready = False
+        self.placeholder_mode = False
+        self.model_version = "placeholder"
+        self.load_status = {
+            model: {"ready": False, "load_seconds": None, "error": None}
+            for model in ("tfidf", "logreg", "svm", "distilbert")
+        }
+        self.loaded_at = None
+        self.warmup_seconds = None
+
+    @property
+    def has_models(self) -> bool:
+        return self.classic_ready or self.bert_ready
+
+    def snapshot(self) -> "ModelBundle":
+        """Copy to publish while this bundle keeps loading (models are shared, not copied)."""
+        clone = copy.copy(self)
+        clone.load_status = copy.deepcopy(self.load_status)
+        return clone
+
+    def close(self):
+        """Stop the bundle's micro-batch worker so its models can be freed."""
+        if self.bert_batcher is not None:
+            self.bert_batcher.close()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "model_version": self.model_version,
+            "classic_ready": self.classic_ready,
+            "bert_ready": self.bert_ready,
+            "distilbert_backend": self.bert_backend,
+            "loaded_at": self.loaded_at,
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+
+class ModelRegistry:
+    """
+    Model versions on disk. The base model directory is the "default" version;
+    every subdirectory of `versions_dir` is a version named after the directory
+    and laid out the same way (tfidf_20k.pkl, ..., distilbert-phishing/).
+    """
+
+    def __init__(self, base_dir: str, versions_dir: str):
+        self.base_dir = base_dir
+        self.versions_dir = versions_dir
+
+    def available(self) -> List[str]:
+        versions = [DEFAULT_VERSION]
+        if os.path.isdir(self.versions_dir):
+            versions.extend(sorted(
+                entry.name for entry in os.scandir(self.versions_dir)
+                if entry.is_dir() and entry.name != DEFAULT_VERSION
+            ))
+        return versions
+
+    def path_for(self, name: str) -> str:
+        """Directory holding version `name`. Raises KeyError for unknown versions."""
+        if name == DEFAULT_VERSION:
+            return self.base_dir
+        # Only names that exist as subdirectories are accepted, so a name can never escape versions_dir
+        if name not in self.available():
+            raise KeyError(name)
+        return os.path.join(self.versions_dir, name)
@@ -1,16 +1,44 @@
 import os
+import re
+import copy
+import hashlib
 import pickle
 import logging
-import re
-from typing import Dict, List, Any, Optional
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple
 import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from bs4 import BeautifulSoup
+from transformers import AutoTokenizer
+from app.services.micro_batcher import MicroBatcher
+from app.services.lru_cache import LRUCache
+from app.services.bert_backends import load_bert_backend
+from app.services.shared_weights import load_shared_pickle
+from app.services.signal_matcher import SignalMatcher
+from app.services.url_features import UrlFeatureCache, SUSPICIOUS_URL_RISK, KNOWN_MALICIOUS_RISK
+from app.services.html_text import html_to_text
+from app.services.metrics import StageMetrics, StageTimer
+from app.services.inference_executor import InferenceExecutor
+from app.services.model_registry import ModelBundle, ModelRegistry, DEFAULT_VERSION
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Sample inputs run through a newly loaded model version before it is swapped in
+WARMUP_TEXTS = [
+    "Hi team, the planning meeting moved to Thursday at 2 PM.",
+    "<p>URGENT: your account is suspended. <a href=\"http://192.0.2.1/login\">Verify your password</a> now.</p>",
+    "Your order has shipped and will arrive on Monday. " * 60,
+]
+
+# DistilBERT files that define its scores: config, weights (possibly sharded) and tokenizer.
+# Derived exports (model.onnx, model.mmap.pt) and temp files are left out of the version.
+BERT_FINGERPRINT_RE = re.compile(
+    r"config\.json|(?:model|pytorch_model)(?:-\d+-of-\d+)?\.(?:safetensors|bin)"
+    r"|(?:model|pytorch_model)\.(?:safetensors|bin)\.index\.json"
+    r"|tokenizer\.json|tokenizer_config\.json|special_tokens_map\.json|vocab\.txt|vocab\.json|merges\.txt"
+)
+
 class PhishingService:
     _instance = None
     
@@ -20,6 +48,56 @@ class PhishingService:
     LOGREG_PATH = os.path.join(MODEL_DIR, "logreg_20k.pkl")
     SVM_PATH = os.path.join(MODEL_DIR, "svm_20k.pkl")
     DISTILBERT_DIR = os.path.join(MODEL_DIR, "distilbert-phishing")
+
+    # Versioned model registry: each subdirectory is a version with the same
+    # layout as MODEL_DIR, which itself is the "default" version
+    MODEL_VERSIONS_DIR = os.getenv("PHISHING_MODEL_VERSIONS_DIR", os.path.join(MODEL_DIR, "versions"))
+    MODEL_VERSION = os.getenv("PHISHING_MODEL_VERSION", DEFAULT_VERSION)
+    # Keep the previous version loaded so rollback is instant (costs its memory)
+    KEEP_PREVIOUS_VERSION = os.getenv("PHISHING_MODEL_KEEP_PREVIOUS", "true").lower() == "true"
+
+    # DistilBERT inference backend: "torch" (fp32), "int8" (dynamic quantization) or "onnx"
+    BERT_BACKEND = os.getenv("PHISHING_BERT_BACKEND", "torch")
+    ONNX_PATH = os.getenv("PHISHING_ONNX_PATH", os.path.join(DISTILBERT_DIR, "model.onnx"))
+
+    # Memory-map model arrays so uvicorn workers share them through the page cache
+    MODEL_MMAP = os.getenv("PHISHING_MODEL_MMAP", "false").lower() == "true"
+
+    # Maximum number of emails per DistilBERT forward pass in batch scoring
+    BERT_BATCH_SIZE = int(os.getenv("PHISHING_BERT_BATCH_SIZE", "16"))
+
+    # Token window per forward pass; "sliding" mode scores long emails as
+    # overlapping windows pooled with "max" or "mean" instead of truncating
+    BERT_MAX_LENGTH = int(os.getenv("PHISHING_BERT_MAX_LENGTH", "128"))
+    BERT_WINDOW_MODE = os.getenv("PHISHING_BERT_WINDOW_MODE", "truncate").lower()
+    BERT_WINDOW_OVERLAP = int(os.getenv("PHISHING_BERT_WINDOW_OVERLAP", "32"))
+    BERT_MAX_WINDOWS = int(os.getenv("PHISHING_BERT_MAX_WINDOWS", "8"))
+    BERT_WINDOW_POOLING = os.getenv("PHISHING_BERT_WINDOW_POOLING", "max").lower()
+
+    # Micro-batching of concurrent DistilBERT requests
+    MICROBATCH_ENABLED = os.getenv("PHISHING_BERT_MICROBATCH", "true").lower() == "true"
+    MICROBATCH_MAX_SIZE = int(os.getenv("PHISHING_MICROBATCH_MAX_SIZE", str(BERT_BATCH_SIZE)))
+    MICROBATCH_MAX_WAIT_MS = float(os.getenv("PHISHING_MICROBATCH_MAX_WAIT_MS", "5"))
+
+    # Request threads for phishing_executor. Each one blocks on the shared
+    # micro-batch, so with batching on there must be enough to fill one.
+    INFERENCE_WORKERS = int(os.getenv("PHISHING_INFERENCE_WORKERS", str(MICROBATCH_MAX_SIZE if MICROBATCH_ENABLED else 2)))
+    INFERENCE_QUEUE_DEPTH = int(os.getenv("PHISHING_INFERENCE_QUEUE_DEPTH", "32"))
+
+    # Result cache for repeated submissions (0 entries disables it)
+    RESULT_CACHE_SIZE = int(os.getenv("PHISHING_RESULT_CACHE_SIZE", "4096"))
+    RESULT_CACHE_TTL_SECONDS = float(os.getenv("PHISHING_RESULT_CACHE_TTL_SECONDS", "3600"))
+
+    # Cascade mode: skip DistilBERT when the classic ensemble is confident, i.e.
+    # its score falls outside [CASCADE_LOW, CASCADE_HIGH]
+    CASCADE_ENABLED = os.getenv("PHISHING_CASCADE_MODE", "false").lower() == "true"
+    CASCADE_LOW = float(os.getenv("PHISHING_CASCADE_LOW", "0.2"))
+    CASCADE_HIGH = float(os.getenv("PHISHING_CASCADE_HIGH", "0.8"))
+
+    # Per-host URL feature cache, and how many recent threatIntelligence
+    # documents seed the known-malicious host list at startup (0 disables seeding)
+    URL_CACHE_SIZE = int(os.getenv("PHISHING_URL_CACHE_SIZE", "50000"))
+    THREAT_SEED_LIMIT = int(os.getenv("PHISHING_THREAT_SEED_LIMIT", "1000"))
     
     def __new__(cls):
         if cls._instance is None:
@@ -30,64 +108,314 @@ class PhishingService:
     def __init__(self):
         if self.initialized:
             return
-            
-        self.placeholder_mode = False
-        self.classic_ready = False
-        self.bert_ready = False
-        
-        self.vectorizer = None
-        self.logreg = None
-        self.svm = None
-        self.tokenizer = None
-        self.bert_model = None
+
+        # All loaded models live in the active bundle; see ModelBundle
+        self.registry = ModelRegistry(self.MODEL_DIR, self.MODEL_VERSIONS_DIR)
+        self.bundle = self._new_bundle(DEFAULT_VERSION)
+        self.previous_bundle = None
+        self.previous_version = None
+        self.activation = None
+        self.result_cache = LRUCache(self.RESULT_CACHE_SIZE, self.RESULT_CACHE_TTL_SECONDS)
+        self.signal_matcher = SignalMatcher.from_config()
+        self.url_features = UrlFeatureCache(self.signal_matcher.url_shorteners, self.URL_CACHE_SIZE)
+        self.cascade_stats = {"early_exit": 0, "escalated": 0}
+        self.stage_metrics = StageMetrics()
+        self._stats_lock = threading.Lock()
         
-        # Load models lazily or set placeholder mode
-        self._load_models()
+        # Models are loaded by load_models() / start_background_load() so that
+        # importing this module does not block application startup.
+        self.loading = False
+        self.load_started_at = None
+        self.load_finished_at = None
+        self._load_lock = threading.Lock()
+        self._load_thread = None
         self.initialized = True
 
-    def _load_models(self):
+    @property
+    def models_loaded(self) -> bool:
+        """True once the startup load has finished, whatever its outcome."""
+        return self.load_finished_at is not None and not self.loading
+
+    @property
+    def model_version(self) -> str:
+        return self.bundle.model_version
+
+    def _new_bundle(self, name: str) -> ModelBundle:
+        if name == DEFAULT_VERSION:
+            return ModelBundle(name, self.TFIDF_PATH, self.LOGREG_PATH, self.SVM_PATH,
+                               self.DISTILBERT_DIR, onnx_path=self.ONNX_PATH)
+        root = self.registry.path_for(name)
+        return ModelBundle(
+            name,
+            os.path.join(root, os.path.basename(self.TFIDF_PATH)),
+            os.path.join(root, os.path.basename(self.LOGREG_PATH)),
+            os.path.join(root, os.path.basename(self.SVM_PATH)),
+            os.path.join(root, os.path.basename(self.DISTILBERT_DIR))
+        )
+
+    def _load_pickle(self, bundle: ModelBundle, name: str, path: str) -> Any:
+        start = time.perf_counter()
+        try:
+            if self.MODEL_MMAP:
+                model = load_shared_pickle(path)
+            else:
+                with open(path, 'rb') as f:
+                    model = pickle.load(f)
+        except Exception as e:
+            bundle.load_status[name]["error"] = str(e)
+            raise
+        bundle.load_status[name].update(ready=True, load_seconds=round(time.perf_counter() - start, 3))
+        return model
+
+    def load_models(self):
+        """Load the configured model version synchronously. Safe to call more than once."""
+        with self._load_lock:
+            if self.models_loaded:
+                return
+            self.loading = True
+            self.load_started_at = time.time()
+            try:
+                try:
+                    bundle = self._new_bundle(self.MODEL_VERSION)
+                except KeyError:
+                    logger.error(f"Unknown phishing model version '{self.MODEL_VERSION}', using '{DEFAULT_VERSION}'.")
+                    bundle = self._new_bundle(DEFAULT_VERSION)
+                # Nothing is serving yet, so publish progressively: the classic
+                # models go live while DistilBERT is still loading
+                self._load_bundle(bundle, publish=True)
+                self._publish(bundle)
+            finally:
+                self.loading = False
+                self.load_finished_at = time.time()
+            logger.info(f"Phishing models loaded in {self.load_finished_at - self.load_started_at:.2f}s (version {self.model_version}).")
+        # Seeding reads Firestore; readiness must not wait on it, nor hold the load lock
+        threading.Thread(target=self.seed_threat_indicators, name="phishing-threat-seed", daemon=True).start()
+
+    def start_background_load(self):
+        """Load models on a daemon thread; requests are served by fallbacks meanwhile."""
+        if self._load_thread is not None or self.models_loaded:
+            return
+        self._load_thread = threading.Thread(target=self.load_models, name="phishing-model-loader", daemon=True)
+        self._load_thread.start()
+
+    def _load_bundle(self, bundle: ModelBundle, publish: bool = False):
         try:
-            # Check for classic ML models
-            if os.path.exists(self.TFIDF_PATH) and os.path.exists(self.LOGREG_PATH) and os.path.exists(self.SVM_PATH):
-                with open(self.TFIDF_PATH, 'rb') as f:
-                    self.vectorizer = pickle.load(f)
-                with open(self.LOGREG_PATH, 'rb') as f:
-                    self.logreg = pickle.load(f)
-                with open(self.SVM_PATH, 'rb') as f:
-                    self.svm = pickle.load(f)
-                self.classic_ready = True
+            # Classic models first: they are small and let requests leave the
+            # heuristic path while DistilBERT is still loading.
+            if os.path.exists(bundle.tfidf_path) and os.path.exists(bundle.logreg_path) and os.path.exists(bundle.svm_path):
+                bundle.vectorizer = self._load_pickle(bundle, "tfidf", bundle.tfidf_path)
+                bundle.logreg = self._load_pickle(bundle, "logreg", bundle.logreg_path)
+                bundle.svm = self._load_pickle(bundle, "svm", bundle.svm_path)
+                bundle.classic_ready = True
+                if publish:
+                    self._publish(bundle.snapshot())
                 logger.info("Classic ML models loaded successfully.")
             else:
-                logger.warning(f"Classic ML models not found at {self.MODEL_DIR}.")
+                for name in ("tfidf", "logreg", "svm"):
+                    bundle.load_status[name]["error"] = "model file not found"
+                logger.warning(f"Classic ML models not found at {bundle.root_dir}.")
 
             # Check for DistilBERT
-            if os.path.exists(self.DISTILBERT_DIR):
+            if os.path.exists(bundle.distilbert_dir):
+                start = time.perf_counter()
                 try:
-                    self.tokenizer = AutoTokenizer.from_pretrained(self.DISTILBERT_DIR)
-                    self.bert_model = AutoModelForSequenceClassification.from_pretrained(self.DISTILBERT_DIR)
-                    self.bert_ready = True
-                    logger.info("DistilBERT model loaded successfully.")
+                    bundle.tokenizer = AutoTokenizer.from_pretrained(bundle.distilbert_dir)
+                    bundle.bert_model, bundle.bert_backend = load_bert_backend(
+                        self.BERT_BACKEND, bundle.distilbert_dir, bundle.tokenizer,
+                        onnx_path=bundle.onnx_path, mmap_weights=self.MODEL_MMAP
+                    )
+                    if self.MICROBATCH_ENABLED:
+                        bundle.bert_batcher = MicroBatcher(
+                            f"distilbert-{bundle.name}",
+                            lambda texts: self._score_bert_batch(bundle, texts),
+                            max_batch_size=self.MICROBATCH_MAX_SIZE,
+                            max_wait_ms=self.MICROBATCH_MAX_WAIT_MS
+                        )
+                    bundle.bert_ready = True
+                    bundle.load_status["distilbert"].update(ready=True, load_seconds=round(time.perf_counter() - start, 3))
+                    logger.info(f"DistilBERT model loaded successfully ({bundle.bert_backend} backend).")
                 except Exception as bert_e:
+                    bundle.load_status["distilbert"]["error"] = str(bert_e)
                     logger.warning(f"DistilBERT exists but failed to load: {str(bert_e)}")
             else:
-                logger.warning(f"DistilBERT model not found at {self.DISTILBERT_DIR}.")
+                bundle.load_status["distilbert"]["error"] = "model directory not found"
+                logger.warning(f"DistilBERT model not found at {bundle.distilbert_dir}.")
             
-            if not self.classic_ready and not self.bert_ready:
-                self.placeholder_mode = True
+            if not bundle.has_models:
+                bundle.placeholder_mode = True
                 logger.error("No models available. Running in placeholder mode.")
                 
         except Exception as e:
             import traceback
             logger.error(f"Error loading models: {str(e)}")
             logger.error(traceback.format_exc())
-            self.placeholder_mode = True
+            bundle.placeholder_mode = not bundle.has_models
+
+        bundle.loaded_at = time.time()
+
+    def _publish(self, bundle: ModelBundle):
+        """Make `bundle` the active one. A single reference assignment, so requests never see a mix."""
+        bundle.model_version = self._compute_model_version(bundle)
+        self.bundle = bundle
+        # Cached verdicts belong to the previous set of models
+        self.result_cache.clear()
+
+    def seed_threat_indicators(self):
+        """Load known-malicious hosts from the most recent threatIntelligence documents."""
+        if self.THREAT_SEED_LIMIT <= 0:
+            return
+        try:
+            from firebase_admin import firestore
+            db = firestore.client()
+            docs = db.collection('threatIntelligence').order_by(
+                'timestamp', direction=firestore.Query.DESCENDING
+            ).limit(self.THREAT_SEED_LIMIT).stream()
+            added = self.add_threat_indicators(doc.to_dict() for doc in docs)
+            logger.info(f"Seeded {added} known-malicious hosts from threatIntelligence.")
+        except Exception as e:
+            logger.warning(f"Could not seed URL reputation from threatIntelligence: {str(e)}")
+
+    def add_threat_indicators(self, threats) -> int:
+        """Add hosts from threat documents to the URL reputation list."""
+        added = self.url_features.add_threats(threats)
+        if added:
+            # Cached verdicts may now miss a known-malicious URL
+            self.result_cache.clear()
+        return added
+
+    def _warm_up(self, bundle: ModelBundle):
+        """Run sample inferences so the first real requests do not pay for lazy initialisation."""
+        start = time.perf_counter()
+        self._analyze_uncached(WARMUP_TEXTS, True, bundle=bundle, record_stats=False)
+        bundle.warmup_seconds = round(time.perf_counter() - start, 3)
+
+    def activate_version(self, name: str):
+        """
+        Load model version `name`, warm it up and swap it in. The active version
+        keeps serving throughout; if loading or warm-up fails nothing changes.
+        Raises KeyError for unknown versions.
+        """
+        bundle = self._new_bundle(name)
+        with self._load_lock:
+            self.activation = {"version": name, "state": "loading", "error": None,
+                               "started_at": time.time(), "finished_at": None}
+            try:
+                self._load_bundle(bundle)
+                failed = [model for model, status in bundle.load_status.items()
+                          if status["error"] and os.path.exists(self._model_path(bundle, model))]
+                if failed or not bundle.has_models:
+                    raise RuntimeError(f"models failed to load: {', '.join(failed) or 'none found'}")
+                self.activation["state"] = "warming"
+                self._warm_up(bundle)
+            except Exception as e:
+                bundle.close()
+                self.activation.update(state="failed", error=str(e), finished_at=time.time())
+                logger.error(f"Activation of phishing model version '{name}' failed: {str(e)}")
+                return
+
+            previous = self.bundle
+            self._publish(bundle)
+            self._retire(previous)
+            self.activation.update(state="active", finished_at=time.time())
+            logger.info(f"Phishing model version {bundle.model_version} is now active.")
+
+    def start_activation(self, name: str) -> bool:
+        """Activate `name` on a daemon thread. Returns False if a load is already running."""
+        self._new_bundle(name)  # raise KeyError for unknown versions before starting
+        if self._load_lock.locked():
+            return False
+        threading.Thread(target=self.activate_version, args=(name,), name="phishing-model-activation", daemon=True).start()
+        return True
+
+    def _retire(self, bundle: ModelBundle):
+        if not bundle.has_models:
+            return
+        if self.previous_bundle is not None:
+            self.previous_bundle.close()
+        if self.KEEP_PREVIOUS_VERSION:
+            self.previous_bundle = bundle
+        else:
+            bundle.close()
+            self.previous_bundle = None
+        self.previous_version = bundle.name
+
+    def rollback(self):
+        """
+        Swap the previous version back in. Instant when it was kept loaded,
+        otherwise it is reloaded from disk. Raises LookupError if there is no
+        previous version.
+        """
+        with self._load_lock:
+            # Read under the lock: a concurrent rollback may have swapped it out already
+            previous, current = self.previous_bundle, self.bundle
+            if previous is not None:
+                self.previous_bundle = None
+                self._publish(previous)
+                self._retire(current)
+                self.activation = {"version": previous.name, "state": "active", "error": None,
+                                   "started_at": time.time(), "finished_at": time.time()}
+        if previous is not None:
+            logger.info(f"Rolled back to phishing model version {previous.model_version}.")
+        elif self.previous_version is not None:
+            self.activate_version(self.previous_version)
+        else:
+            raise LookupError("no previous model version")
+
+    def reload_models(self):
+        """Load the active version again from disk and swap it in."""
+        self.activate_version(self.bundle.name)
+
+    @staticmethod
+    def _model_path(bundle: ModelBundle, model: str) -> str:
+        return {"tfidf": bundle.tfidf_path, "logreg": bundle.logreg_path,
+                "svm": bundle.svm_path, "distilbert": bundle.distilbert_dir}[model]
+
+    def _compute_model_version(self, bundle: ModelBundle) -> str:
+        """Identify a bundle by version name plus a fingerprint of its source files (name, size, mtime)."""
+        if bundle.placeholder_mode or not bundle.has_models:
+            return "placeholder"
+        paths = []
+        if bundle.classic_ready:
+            paths.extend([bundle.tfidf_path, bundle.logreg_path, bundle.svm_path])
+        if bundle.bert_ready:
+            paths.extend(os.path.join(bundle.distilbert_dir, name) for name in os.listdir(bundle.distilbert_dir)
+                         if BERT_FINGERPRINT_RE.fullmatch(name))
+        digest = hashlib.sha256()
+        # Quantized backends and window settings change DistilBERT scores
+        digest.update(f"backend:{bundle.bert_backend};window:{self.BERT_WINDOW_MODE}/{self.BERT_WINDOW_POOLING};".encode())
+        for path in sorted(paths):
+            try:
+                stat = os.stat(path)
+                digest.update(f"{os.path.relpath(path, bundle.root_dir)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+            except OSError:
+                continue
+        return f"{bundle.name}-{digest.hexdigest()[:12]}"
+
+    def _cache_key(self, model_version: str, email_text: str, strip_html: bool) -> str:
+        normalized = email_text.strip().replace("\r\n", "\n")
+        digest = hashlib.sha256()
+        digest.update(f"{model_version}|{int(strip_html)}|".encode())
+        digest.update(normalized.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
 
     def strip_html(self, text: str) -> str:
+        return self.html_to_text(text)[0]
+
+    def html_to_text(self, text: str) -> Tuple[str, List[str]]:
+        """Visible text plus link targets (href values) found in the markup."""
         try:
-            soup = BeautifulSoup(text, "html.parser")
-            return soup.get_text()
-        except:
-            return text
+            return html_to_text(text)
+        except Exception:
+            return text, []
+
+    @staticmethod
+    def _signal_text(clean_text: str, links: List[str]) -> str:
+        # Links hidden behind anchor text are appended so extract_signals sees them;
+        # targets already visible in the text are not repeated.
+        hidden = [link for link in dict.fromkeys(links) if link not in clean_text]
+        if not hidden:
+            return clean_text
+        return clean_text + "\n" + "\n".join(hidden)
 
     def extract_signals(self, text: str) -> Dict[str, Any]:
         signals = {
@@ -96,67 +424,122 @@ class PhishingService:
             "credential_requests": [],
             "risk_score_base": 0.0
         }
-        
-        # URL detection (simple regex)
-        urls = re.findall(r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+', text)
+
+        # URLs, urgency and credential phrases are found in one pass over the text
+        urls, urgent_found, credential_found = self.signal_matcher.scan(text)
+
         for url in urls:
-            is_ip = re.search(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', url) is not None
-            is_shortened = any(s in url for s in ['bit.ly', 'tinyurl.com', 'goo.gl', 't.co', 'ow.ly'])
-            signals["urls_detected"].append({
-                "url": url,
-                "is_ip": is_ip,
-                "is_shortened": is_shortened,
-                "suspicious": is_ip or is_shortened
-            })
-            if is_ip or is_shortened:
-                signals["risk_score_base"] += 0.2
+            # Host features are cached; reputation comes from the threat feed
+            features = self.url_features.features(url)
+            signals["urls_detected"].append({"url": url, **features})
+            if features["suspicious"]:
+                signals["risk_score_base"] += SUSPICIOUS_URL_RISK
+            if features["known_malicious"]:
+                signals["risk_score_base"] += KNOWN_MALICIOUS_RISK
 
         # Urgency detection
-        urgent_keywords = ['urgent', 'immediately', 'suspended', 'closed', 'action required', 'last chance', 'warning', 'important']
-        for kw in urgent_keywords:
-            if kw.lower() in text.lower():
-                signals["urgent_language"].append(kw)
-                signals["risk_score_base"] += 0.1
+        for kw in urgent_found:
+            signals["urgent_language"].append(kw)
+            signals["risk_score_base"] += 0.1
 
         # Credential requests
-        cred_keywords = ['verify your password', 'enter your pin', 'reset link', 'confirm identity', 'secure login']
-        for kw in cred_keywords:
-            if kw.lower() in text.lower():
-                signals["credential_requests"].append(kw)
-                signals["risk_score_base"] += 0.15
+        for kw in credential_found:
+            signals["credential_requests"].append(kw)
+            signals["risk_score_base"] += 0.15
                 
         return signals
 
-    def analyze_email(self, email_text: str, strip_html: bool = True) -> Dict[str, Any]:
-        if strip_html:
-            clean_text = self.strip_html(email_text)
-        else:
-            clean_text = email_text
+    def _score_classic(self, bundle: ModelBundle, clean_texts: List[str],
+                       timer: Optional[StageTimer] = None) -> Tuple[List[float], List[float]]:
+        """
+        Score a batch with LogReg and SVM. The whole batch is vectorized into a
+        single sparse matrix so each model is called exactly once.
+        """
+        timer = timer or StageTimer()
+        with timer.stage("tfidf"):
+            vectorized = bundle.vectorizer.transform(clean_texts)
+        with timer.stage("logreg"):
+            logreg_scores = [float(p) for p in bundle.logreg.predict_proba(vectorized)[:, 1]]
+        with timer.stage("svm"):
+            if hasattr(bundle.svm, 'predict_proba'):
+                svm_scores = [float(p) for p in bundle.svm.predict_proba(vectorized)[:, 1]]
+            else:
+                decisions = torch.as_tensor(bundle.svm.decision_function(vectorized), dtype=torch.float64)
+                svm_scores = [float(p) for p in torch.sigmoid(decisions).reshape(-1)]
+        return logreg_scores, svm_scores
 
-        signals = self.extract_signals(clean_text)
-        
-        model_scores = {
-            "logreg": 0.0,
-            "svm": 0.0,
-            "distilbert": 0.0
-        }
-        
-        if self.classic_ready:
-            vectorized_text = self.vectorizer.transform([clean_text])
-            model_scores["logreg"] = float(self.logreg.predict_proba(vectorized_text)[0][1])
-            if hasattr(self.svm, 'predict_proba'):
-                model_scores["svm"] = float(self.svm.predict_proba(vectorized_text)[0][1])
+    def _score_bert_batch(self, bundle: ModelBundle, clean_texts: List[str]) -> List[float]:
+        """
+        Score a batch with DistilBERT. In "truncate" mode each text is cut at
+        BERT_MAX_LENGTH tokens; in "sliding" mode long texts are split into
+        overlapping windows that are all scored together and pooled per text.
+        """
+        if self.BERT_WINDOW_MODE != "sliding":
+            sequences = [
+                bundle.tokenizer(text, truncation=True, max_length=self.BERT_MAX_LENGTH)["input_ids"]
+                for text in clean_texts
+            ]
+            return self._score_token_sequences(bundle, sequences)
+
+        windows: List[List[int]] = []
+        owners: List[int] = []
+        for index, text in enumerate(clean_texts):
+            token_ids = bundle.tokenizer(text, add_special_tokens=False, truncation=False, verbose=False)["input_ids"]
+            for window in self._token_windows(bundle, token_ids):
+                windows.append(window)
+                owners.append(index)
+
+        window_scores: List[List[float]] = [[] for _ in clean_texts]
+        for owner, prob in zip(owners, self._score_token_sequences(bundle, windows)):
+            window_scores[owner].append(prob)
+
+        if self.BERT_WINDOW_POOLING == "mean":
+            return [sum(probs) / len(probs) for probs in window_scores]
+        return [max(probs) for probs in window_scores]
+
+    def _token_windows(self, bundle: ModelBundle, token_ids: List[int]) -> List[List[int]]:
+        """
+        Split token ids into windows of BERT_MAX_LENGTH (special tokens included)
+        overlapping by BERT_WINDOW_OVERLAP tokens. When that would need more than
+        BERT_MAX_WINDOWS windows, exactly BERT_MAX_WINDOWS are spread evenly over
+        the text instead, so cost per email stays bounded.
+        """
+        cls_id, sep_id = bundle.tokenizer.cls_token_id, bundle.tokenizer.sep_token_id
+        body = self.BERT_MAX_LENGTH - 2
+        if len(token_ids) <= body:
+            starts = [0]
+        else:
+            span = len(token_ids) - body
+            step = max(1, body - self.BERT_WINDOW_OVERLAP)
+            count = -(-span // step) + 1
+            if count > self.BERT_MAX_WINDOWS:
+                count = max(1, self.BERT_MAX_WINDOWS)
+                starts = [round(k * span / (count - 1)) for k in range(count)] if count > 1 else [0]
             else:
-                decision = self.svm.decision_function(vectorized_text)[0]
-                model_scores["svm"] = 1 / (1 + torch.exp(-torch.tensor(decision)).item())
+                starts = [min(k * step, span) for k in range(count)]
+        return [[cls_id] + token_ids[start:start + body] + [sep_id] for start in starts]
 
-        if self.bert_ready:
-            inputs = self.tokenizer(clean_text, return_tensors="pt", truncation=True, max_length=128)
+    def _score_token_sequences(self, bundle: ModelBundle, sequences: List[List[int]]) -> List[float]:
+        """
+        Run DistilBERT over tokenized sequences in padded mini-batches.
+        Sequences are sorted by length first so each mini-batch pads to a similar size.
+        """
+        scores = [0.0] * len(sequences)
+        order = sorted(range(len(sequences)), key=lambda i: len(sequences[i]))
+        for start in range(0, len(order), self.BERT_BATCH_SIZE):
+            chunk = order[start:start + self.BERT_BATCH_SIZE]
+            inputs = bundle.tokenizer.pad({"input_ids": [sequences[i] for i in chunk]}, return_tensors="pt")
             with torch.no_grad():
-                logits = self.bert_model(**inputs).logits
-                model_scores["distilbert"] = torch.softmax(logits, dim=1)[0][1].item()
-        
-        if self.placeholder_mode:
+                logits = bundle.bert_model(**inputs).logits
+                probs = torch.softmax(logits, dim=1)[:, 1].tolist()
+            for i, prob in zip(chunk, probs):
+                scores[i] = prob
+        return scores
+
+    def _build_result(self, model_scores: Dict[str, float], signals: Dict[str, Any], classic_used: bool,
+                      bert_used: bool, model_version: str, cascade: bool = False) -> Dict[str, Any]:
+        # Heuristic scores when no model is available, including while models are still loading
+        if not (classic_used or bert_used):
             heuristic_prob = min(0.7, signals["risk_score_base"])
             model_scores = {
                 "logreg": heuristic_prob,
@@ -165,17 +548,17 @@ class PhishingService:
             }
 
         # Dynamic Ensemble Weighting
-        if self.classic_ready and self.bert_ready:
+        if classic_used and bert_used:
             # Production: (30% LogReg, 30% SVM, 40% DistilBERT)
             final_confidence = (0.3 * model_scores["logreg"] + 
                                 0.3 * model_scores["svm"] + 
                                 0.4 * model_scores["distilbert"])
-            model_status = "production"
-        elif self.classic_ready:
-            # Fallback: 50/50 Classic Ensemble
+            model_status = "cascade_full" if cascade else "production"
+        elif classic_used:
+            # Fallback: 50/50 Classic Ensemble (also the cascade's early exit)
             final_confidence = (0.5 * model_scores["logreg"] + 0.5 * model_scores["svm"])
-            model_status = "classic_ensemble_fallback"
-        elif self.bert_ready:
+            model_status = "cascade_early_exit" if cascade else "classic_ensemble_fallback"
+        elif bert_used:
             # Rare case: Only BERT ready
             final_confidence = model_scores["distilbert"]
             model_status = "bert_only"
@@ -211,8 +594,124 @@ class PhishingService:
             "explanations": {
                 "short_summary": summary,
                 "model_status": model_status
-            }
+            },
+            "model_version": model_version
         }
 
+    def analyze_batch(self, texts: List[str], strip_html: bool = True,
+                      include_timings: bool = False) -> List[Dict[str, Any]]:
+        """
+        Analyze several emails at once. Results are returned in input order and
+        match what analyze_email would return for each text individually.
+        Texts already seen with the same models are answered from the result cache.
+
+        Stage durations are always recorded in `stage_metrics`; with
+        `include_timings` each result also carries a `timings` block. Stages run
+        once per batch, so in a batch call the stage times cover all its emails.
+        """
+        if not texts:
+            return []
+
+        # Every text in the call is scored by the bundle active when it started
+        bundle = self.bundle
+        timer = StageTimer()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}
+        with timer.stage("cache_lookup"):
+            keys = [self._cache_key(bundle.model_version, t, strip_html) for t in texts]
+            for i, key in enumerate(keys):
+                if key in pending:
+                    pending[key].append(i)
+                    continue
+                cached = self.result_cache.get(key)
+                if cached is not None:
+                    results[i] = copy.deepcopy(cached)
+                else:
+                    pending[key] = [i]
+
+        if pending:
+            fresh = self._analyze_uncached([texts[indexes[0]] for indexes in pending.values()], strip_html, timer, bundle)
+            for (key, indexes), result in zip(pending.items(), fresh):
+                self.result_cache.set(key, result)
+                for i in indexes:
+                    results[i] = copy.deepcopy(result)
+
+        self.stage_metrics.record(timer.finish())
+        if include_timings:
+            timings = timer.as_dict()
+            computed = {i for indexes in pending.values() for i in indexes}
+            for i, result in enumerate(results):
+                result["timings"] = {**timings, "batch_size": len(texts), "cached": i not in computed}
+
+        return results
+
+    def _analyze_uncached(self, texts: List[str], strip_html: bool, timer: Optional[StageTimer] = None,
+                          bundle: Optional[ModelBundle] = None, record_stats: bool = True) -> List[Dict[str, Any]]:
+        timer = timer or StageTimer()
+        bundle = bundle or self.bundle
+        if strip_html:
+            with timer.stage("strip_html"):
+                stripped = [self.html_to_text(t) for t in texts]
+                clean_texts = [text for text, _ in stripped]
+                signal_texts = [self._signal_text(text, links) for text, links in stripped]
+        else:
+            clean_texts = list(texts)
+            signal_texts = clean_texts
+
+        # Models score the visible text only; signals also cover hidden link targets
+        with timer.stage("extract_signals"):
+            all_signals = [self.extract_signals(t) for t in signal_texts]
+        all_scores = [{"logreg": 0.0, "svm": 0.0, "distilbert": 0.0} for _ in clean_texts]
+
+        classic_ready = bundle.classic_ready
+        bert_ready = bundle.bert_ready
+        cascade = self.CASCADE_ENABLED and classic_ready and bert_ready
+
+        if classic_ready:
+            logreg_scores, svm_scores = self._score_classic(bundle, clean_texts, timer)
+            for scores, lr, sv in zip(all_scores, logreg_scores, svm_scores):
+                scores["logreg"] = lr
+                scores["svm"] = sv
+
+        bert_indexes = list(range(len(clean_texts))) if bert_ready else []
+        if cascade:
+            bert_indexes = [
+                i for i in bert_indexes
+                if self.CASCADE_LOW <= 0.5 * all_scores[i]["logreg"] + 0.5 * all_scores[i]["svm"] <= self.CASCADE_HIGH
+            ]
+            if record_stats:
+                with self._stats_lock:
+                    self.cascade_stats["escalated"] += len(bert_indexes)
+                    self.cascade_stats["early_exit"] += len(clean_texts) - len(bert_indexes)
+
+        if bert_indexes:
+            bert_texts = [clean_texts[i] for i in bert_indexes]
+            # Includes time spent waiting for a shared micro-batch
+            with timer.stage("distilbert"):
+                if bundle.bert_batcher is not None:
+                    # Share forward passes with other requests arriving concurrently
+                    futures = bundle.bert_batcher.submit_many(bert_texts)
+                    bert_scores = [f.result() for f in futures]
+                else:
+                    bert_scores = self._score_bert_batch(bundle, bert_texts)
+            for i, prob in zip(bert_indexes, bert_scores):
+                all_scores[i]["distilbert"] = prob
+
+        bert_used = set(bert_indexes)
+        return [
+            self._build_result(scores, signals, classic_ready, i in bert_used, bundle.model_version, cascade=cascade)
+            for i, (scores, signals) in enumerate(zip(all_scores, all_signals))
+        ]
+
+    def analyze_email(self, email_text: str, strip_html: bool = True, include_timings: bool = False) -> Dict[str, Any]:
+        return self.analyze_batch([email_text], strip_html=strip_html, include_timings=include_timings)[0]
+
 # Global instance
 phishing_service = PhishingService()
+
+# Bounded pool the phishing router runs inference on
+phishing_executor = InferenceExecutor(
+    name="phishing-inference",
+    max_workers=PhishingService.INFERENCE_WORKERS,
+    max_queue_depth=PhishingService.INFERENCE_QUEUE_DEPTH
+)
@@ -0,0 +1,157 @@
+import os
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+# Whole-prompt budget for a Cy chat turn, in (estimated) Gemini tokens
+PROMPT_MAX_TOKENS = int(os.getenv("CY_PROMPT_MAX_TOKENS", "6000"))
+QUESTION_MAX_TOKENS = int(os.getenv("CY_PROMPT_QUESTION_MAX_TOKENS", "500"))
+# Share of the context budget reserved for threat data on the threats path
+THREAT_SHARE = float(os.getenv("CY_PROMPT_THREAT_SHARE", "0.4"))
+
+# A chunk is only cut to fit when at least this much of it can be kept
+MIN_PARTIAL_TOKENS = 40
+# Overlaps shorter than this are coincidence, not chunk overlap
+MIN_OVERLAP_CHARS = 32
+
+TRUNCATION_MARK = " [...]"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimated Gemini token count (about four characters per token). Gemini's
+    tokenizer is only reachable through the API, and an estimate is enough
+    for budgeting.
+    """
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to about `max_tokens`, preferring a sentence or word boundary."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * 4 - len(TRUNCATION_MARK))
+    cut = text[:limit]
+    sentence_end = max(cut.rfind(". "), cut.rfind("\n"))
+    if sentence_end >= limit * 0.7:
+        cut = cut[:sentence_end + 1]
+    elif " " in cut:
+        cut = cut[:cut.rfind(" ")]
+    return cut.rstrip() + TRUNCATION_MARK
+
+
+def truncate_lines(text: str, max_tokens: int) -> str:
+    """Keep whole lines of `text` (e.g. one threat per line) up to `max_tokens`."""
+    kept, used = [], 0
+    for line in text.split("\n"):
+        cost = count_tokens(line + "\n")
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+def _overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of `first` that is also a prefix of `second`."""
+    if len(second) < MIN_OVERLAP_CHARS:
+        return 0
+    probe = second[:MIN_OVERLAP_CHARS]
+    start = first.find(probe)
+    while start != -1:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(probe, start + 1)
+    return 0
+
+
+def dedupe_chunks(chunks: List[str]) -> Tuple[List[str], int, int]:
+    """
+    Drop chunks repeated in (or contained by) an earlier chunk and trim text
+    that neighbouring chunks share. The splitter overlaps adjacent chunks, so
+    retrieving both would otherwise send the overlap twice. Returns the kept
+    chunks, the number removed and the number trimmed.
+    """
+    kept: List[str] = []
+    removed = trimmed = 0
+    for chunk in chunks:
+        text = chunk.strip()
+        if not text or any(text in other for other in kept):
+            removed += 1
+            continue
+        lead = max((_overlap(other, text) for other in kept), default=0)
+        tail = max((_overlap(text, other) for other in kept), default=0)
+        if lead or tail:
+            text = text[lead:len(text) - tail].strip()
+            if not text:
+                removed += 1
+                continue
+            trimmed += 1
+        kept.append(text)
+    return kept, removed, trimmed
+
+
+class PromptBudget:
+    """
+    Fits a chat turn into `max_tokens`.
+
+    The fixed instructions and the (capped) question are always sent. What
+    is left is split between course material and threat context. Threat
+    data gets up to `threat_share` of it, and each side can use whatever the
+    other leaves unused. Chunks are deduplicated and added in retrieval
+    order. The last chunk that fits is cut at a sentence boundary, and the
+    rest are dropped. Threat context is cut by whole lines.
+    """
+
+    def __init__(self, max_tokens: int = PROMPT_MAX_TOKENS, question_max_tokens: int = QUESTION_MAX_TOKENS,
+                 threat_share: float = THREAT_SHARE):
+        self.max_tokens = max_tokens
+        self.question_max_tokens = question_max_tokens
+        self.threat_share = threat_share
+
+    def fit(self, instructions: str, question: str, chunks: List[str],
+            threat_context: Optional[str] = None) -> Tuple[str, List[str], Optional[str], Dict[str, Any]]:
+        truncated = []
+        fitted_question = truncate_to_tokens(question, self.question_max_tokens)
+        if fitted_question != question:
+            truncated.append("question")
+
+        available = max(0, self.max_tokens - count_tokens(instructions) - count_tokens(fitted_question))
+        threat_tokens = count_tokens(threat_context) if threat_context else 0
+        material_budget = available - min(threat_tokens, int(available * self.threat_share))
+
+        unique, removed, trimmed = dedupe_chunks(chunks)
+        material: List[str] = []
+        material_used = 0
+        for chunk in unique:
+            remaining = material_budget - material_used
+            cost = count_tokens(chunk)
+            if cost > remaining:
+                if remaining >= MIN_PARTIAL_TOKENS:
+                    chunk = truncate_to_tokens(chunk, remaining)
+                    material.append(chunk)
+                    material_used += count_tokens(chunk)
+                truncated.append("course_material")
+                break
+            material.append(chunk)
+            material_used += cost
+
+        fitted_threats = threat_context
+        if threat_context:
+            threat_budget = available - material_used
+            if threat_tokens > threat_budget:
+                fitted_threats = truncate_lines(threat_context, threat_budget)
+                truncated.append("threat_context")
+
+        report = {
+            "max_tokens": self.max_tokens,
+            "instruction_tokens": count_tokens(instructions),
+            "question_tokens": count_tokens(fitted_question),
+            "material_tokens": material_used,
+            "threat_tokens": count_tokens(fitted_threats) if fitted_threats else 0,
+            "chunks_retrieved": len(chunks),
+            "chunks_used": len(material),
+            "duplicates_removed": removed,
+            "overlaps_trimmed": trimmed,
+            "truncated": truncated,
+        }
+        return fitted_question, material, fitted_threats, report
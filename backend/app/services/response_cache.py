@@ -0,0 +1,127 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+def document_key(doc: Document) -> str:
+    """Stable identity of a retrieved document: its vector store id, else a content hash."""
+    if getattr(doc, "id", None):
+        return str(doc.id)
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class SemanticResponseCache:
+    """
+    Cache of Cy answers matched by meaning rather than exact text.
+
+    Entries are grouped by an exact scope: the course path, the ids of the
+    retrieved documents and the version of any other prompt context (the
+    threat snapshot). Within a scope, a cached answer is reused when its
+    query embedding has cosine similarity >= `threshold` with the new one.
+    Scopes are evicted least-recently-used once `max_entries` answers are
+    held, and entries expire after `ttl_seconds`. A `max_entries` of 0
+    disables the cache.
+    """
+
+    def __init__(self, max_entries: int, threshold: float = 0.95,
+                 ttl_seconds: Optional[float] = 3600, max_per_scope: int = 16):
+        self.max_entries = max(0, max_entries)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.max_per_scope = max(1, max_per_scope)
+        self._scopes: "OrderedDict[Hashable, List[tuple]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def scope(path: str, docs: Sequence[Document], context_version: str = "") -> Hashable:
+        # Retrieval order does not change the prompt's meaning, so ids are sorted
+        return (path or "", tuple(sorted(document_key(d) for d in docs)), context_version)
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _live(self, entries: List[tuple], now: float) -> List[tuple]:
+        if self.ttl_seconds is None:
+            return entries
+        return [e for e in entries if now - e[2] <= self.ttl_seconds]
+
+    def get(self, scope: Hashable, embedding: Sequence[float]) -> Optional[str]:
+        if not self.enabled:
+            return None
+        query = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries:
+                live = self._live(entries, now)
+                self._size -= len(entries) - len(live)
+                if live:
+                    self._scopes[scope] = live
+                    self._scopes.move_to_end(scope)
+                else:
+                    del self._scopes[scope]
+                best, best_score = None, self.threshold
+                for vector, response, _ in live:
+                    score = float(np.dot(vector, query))
+                    if score >= best_score:
+                        best, best_score = response, score
+                if best is not None:
+                    self._hits += 1
+                    return best
+            self._misses += 1
+            return None
+
+    def set(self, scope: Hashable, embedding: Sequence[float], response: str) -> None:
+        if not self.enabled:
+            return
+        entry = (self._unit(embedding), response, time.monotonic())
+        with self._lock:
+            entries = self._scopes.setdefault(scope, [])
+            entries.append(entry)
+            self._size += 1
+            if len(entries) > self.max_per_scope:
+                entries.pop(0)
+                self._size -= 1
+                self._evictions += 1
+            self._scopes.move_to_end(scope)
+            while self._size > self.max_entries and self._scopes:
+                _, evicted = self._scopes.popitem(last=False)
+                self._size -= len(evicted)
+                self._evictions += len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scopes.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            return {
+                "enabled": self.enabled,
+                "size": self._size,
+                "scopes": len(self._scopes),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": hits,
+                "misses": misses,
+                "evictions": self._evictions,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0
+            }
@@ -0,0 +1,87 @@
+"""
+Memory-mappable copies of the phishing models.
+
+Each uvicorn worker normally unpickles its own copy of every model. In shared
+mode the models are converted once into formats whose large arrays can be
+memory-mapped read-only (joblib for sklearn, a zip-format torch state dict for
+DistilBERT). The kernel then backs those arrays with the same page-cache pages
+in every worker, so resident memory no longer grows with the worker count.
+"""
+import os
+import pickle
+import logging
+from typing import Any
+import joblib
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification
+
+logger = logging.getLogger(__name__)
+
+TORCH_MMAP_FILENAME = "model.mmap.pt"
+
+
+def _is_stale(derived_path: str, source_path: str) -> bool:
+    return not os.path.exists(derived_path) or os.path.getmtime(derived_path) < os.path.getmtime(source_path)
+
+
+def _atomic_target(path: str) -> str:
+    # Workers may convert concurrently; each writes its own temp file and the
+    # final rename is atomic, so readers never see a partial file.
+    return f"{path}.{os.getpid()}.tmp"
+
+
+def joblib_path_for(pkl_path: str) -> str:
+    return os.path.splitext(pkl_path)[0] + ".joblib"
+
+
+def export_joblib(pkl_path: str) -> str:
+    """Convert a pickled sklearn model to joblib so its numpy arrays can be mmapped."""
+    target = joblib_path_for(pkl_path)
+    if not _is_stale(target, pkl_path):
+        return target
+    with open(pkl_path, 'rb') as f:
+        model = pickle.load(f)
+    tmp = _atomic_target(target)
+    joblib.dump(model, tmp)
+    os.replace(tmp, target)
+    logger.info(f"Exported shared copy of {os.path.basename(pkl_path)} to {target}")
+    return target
+
+
+def load_shared_pickle(pkl_path: str) -> Any:
+    """
+    Load a sklearn model with its arrays (idf, coefficients, support vectors)
+    memory-mapped read-only. Python-object state such as the TF-IDF vocabulary
+    dict is still materialized per process.
+    """
+    return joblib.load(export_joblib(pkl_path), mmap_mode="r")
+
+
+def export_torch_mmap(model_dir: str) -> str:
+    """Save the classifier's state dict in torch's zip format, which torch.load can mmap."""
+    target = os.path.join(model_dir, TORCH_MMAP_FILENAME)
+    sources = [os.path.join(model_dir, name) for name in ("model.safetensors", "pytorch_model.bin", "config.json")]
+    source = next((path for path in sources if os.path.exists(path)), None)
+    if os.path.exists(target) and (source is None or not _is_stale(target, source)):
+        return target
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    tmp = _atomic_target(target)
+    torch.save(model.state_dict(), tmp)
+    os.replace(tmp, target)
+    logger.info(f"Exported mmap-able DistilBERT weights to {target}")
+    return target
+
+
+def load_torch_mmap(model_dir: str) -> torch.nn.Module:
+    """
+    Build the classifier from its config and attach weights that stay backed
+    by the mmapped file (assign=True keeps the loaded tensors instead of
+    copying them into freshly allocated parameters).
+    """
+    weights_path = export_torch_mmap(model_dir)
+    config = AutoConfig.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_config(config)
+    state_dict = torch.load(weights_path, mmap=True, weights_only=True, map_location="cpu")
+    model.load_state_dict(state_dict, assign=True)
+    model.eval()
+    return model
@@ -0,0 +1,113 @@
+import re
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+SIGNALS_CONFIG_PATH = Path(__file__).parent.parent.parent / "config" / "phishing_signals.json"
+
+DEFAULT_URGENT_KEYWORDS = ['urgent', 'immediately', 'suspended', 'closed', 'action required', 'last chance', 'warning', 'important']
+DEFAULT_CREDENTIAL_KEYWORDS = ['verify your password', 'enter your pin', 'reset link', 'confirm identity', 'secure login']
+DEFAULT_URL_SHORTENERS = ['bit.ly', 'tinyurl.com', 'goo.gl', 't.co', 'ow.ly']
+
+URL_PATTERN = r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+'
+
+
+def build_trie_pattern(words: Iterable[str]) -> str:
+    """
+    Build a regex alternation shaped like a trie ("urgen(?:t|cy)" rather than
+    "urgent|urgency"). The engine then branches on one character at a time, so
+    matching cost depends on keyword length rather than on how many keywords
+    there are. Optional suffixes are greedy, so the longest keyword that
+    starts at a position is the one matched.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def render(node: Dict[str, Any]) -> str:
+        terminal = "" in node
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch != ""]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            return "(?:" + body + ")?"
+        return body
+
+    return render(trie)
+
+
+class SignalMatcher:
+    """
+    Finds URLs, urgency terms and credential phrases with precompiled patterns.
+
+    The text is lowercased once and URLs are collected with one compiled regex.
+    Short keyword lists are checked with plain substring search, which is the
+    fastest option in CPython for a handful of terms. Once the combined list
+    reaches TRIE_MIN_KEYWORDS, keywords are matched by a single trie-shaped
+    regex instead, so large config-driven lists do not cost one full text scan
+    per keyword. Either way, the keywords reported are exactly those for which
+    `kw in text.lower()` holds.
+    """
+
+    TRIE_MIN_KEYWORDS = 32
+
+    def __init__(self, urgent_keywords: List[str], credential_keywords: List[str], url_shorteners: List[str]):
+        self.urgent_keywords = [kw.lower() for kw in urgent_keywords]
+        self.credential_keywords = [kw.lower() for kw in credential_keywords]
+        self.url_shorteners = list(url_shorteners)
+
+        self._keywords = list(dict.fromkeys(self.urgent_keywords + self.credential_keywords))
+        self._url_re = re.compile(URL_PATTERN)
+
+        self._keyword_re = None
+        if len(self._keywords) >= self.TRIE_MIN_KEYWORDS:
+            self._keyword_re = re.compile(build_trie_pattern(self._keywords))
+            # Keyword -> every keyword contained in it (including itself)
+            self._contained = {kw: [other for other in self._keywords if other in kw] for kw in self._keywords}
+
+    @classmethod
+    def from_config(cls, path: Path = SIGNALS_CONFIG_PATH) -> "SignalMatcher":
+        """Load keyword and shortener lists from JSON, falling back to the built-in lists."""
+        data: Dict[str, Any] = {}
+        try:
+            if path.exists():
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                logger.info(f"Loaded phishing signal lists from {path}")
+        except Exception as e:
+            logger.error(f"Failed to load phishing signal config: {str(e)}")
+        return cls(
+            data.get("urgent_keywords", DEFAULT_URGENT_KEYWORDS),
+            data.get("credential_keywords", DEFAULT_CREDENTIAL_KEYWORDS),
+            data.get("url_shorteners", DEFAULT_URL_SHORTENERS)
+        )
+
+    def _find_keywords(self, lowered: str) -> set:
+        if self._keyword_re is None:
+            return {kw for kw in self._keywords if kw in lowered}
+
+        # The trie matches the longest keyword at each start; restarting one
+        # character after every hit keeps overlapping keywords, and crediting
+        # contained keywords covers shorter ones sharing the same start.
+        found = set()
+        search = self._keyword_re.search
+        match = search(lowered)
+        while match is not None:
+            found.update(self._contained[match.group()])
+            match = search(lowered, match.start() + 1)
+        return found
+
+    def scan(self, text: str) -> Tuple[List[str], List[str], List[str]]:
+        """Return (urls in order, urgent keywords found, credential keywords found)."""
+        urls = self._url_re.findall(text)
+        found = self._find_keywords(text.lower())
+        urgent = [kw for kw in self.urgent_keywords if kw in found]
+        credentials = [kw for kw in self.credential_keywords if kw in found]
+        return urls, urgent, credentials
@@ -0,0 +1,139 @@
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from app.services.prompt_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+EMPTY_THREAT_CONTEXT = "No threat intelligence data available yet. Suggest the user click 'Refresh Live Feeds' on the dashboard."
+UNAVAILABLE_THREAT_CONTEXT = "Unable to load current threat data."
+
+# Without a snapshot to fall back on, a failed build is retried after this long
+FAILURE_RETRY_SECONDS = 15
+
+
+def format_threat_line(data: Dict[str, Any]) -> str:
+    severity = data.get("severity", "Unknown")
+    source = data.get("source", "Unknown")
+    ttype = data.get("type", "Unknown")
+    desc = data.get("description", "No description")
+    indicators = ", ".join(str(i) for i in (data.get("indicators") or [])[:5])
+    return f"- [{severity}] ({source}) {ttype}: {desc} | Indicators: {indicators}"
+
+
+class ThreatContextSnapshot:
+    """Formatted threat intelligence for Cy's prompt, built once and shared by every chat."""
+
+    def __init__(self, text: str, threat_count: int, included: int, built_at: float, ok: bool = True):
+        self.text = text
+        self.threat_count = threat_count
+        self.included = included
+        self.tokens = count_tokens(text)
+        self.built_at = built_at
+        self.ok = ok
+        # Content hash: a rebuild that yields the same text keeps cached answers valid
+        self.version = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "threats": self.threat_count,
+            "included": self.included,
+            "tokens": self.tokens,
+            "age_seconds": round(time.monotonic() - self.built_at, 1),
+            "ok": self.ok,
+        }
+
+
+class ThreatContextCache:
+    """
+    Holds the current threat-context snapshot in memory.
+
+    `fetch_threats` (a blocking Firestore read) is called only when the
+    snapshot is older than `ttl_seconds` or has been invalidated, and by one
+    thread at a time. Threats are taken newest first until `max_tokens` is
+    reached. If a rebuild fails, the previous snapshot keeps being served.
+    """
+
+    def __init__(self, fetch_threats: Callable[[], Iterable[Dict[str, Any]]],
+                 ttl_seconds: float = 300, max_tokens: int = 4000):
+        self.fetch_threats = fetch_threats
+        self.ttl_seconds = ttl_seconds
+        self.max_tokens = max_tokens
+        self._snapshot: Optional[ThreatContextSnapshot] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._builds = 0
+        self._failures = 0
+
+    def current(self) -> Optional[ThreatContextSnapshot]:
+        """The snapshot if it is still fresh, else None. Never blocks on Firestore."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._expires_at:
+            return snapshot
+        return None
+
+    def get(self) -> ThreatContextSnapshot:
+        """A fresh snapshot, rebuilding it if needed (blocking; call off the event loop)."""
+        snapshot = self.current()
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            # Another caller may have rebuilt it while we waited
+            snapshot = self.current()
+            if snapshot is not None:
+                return snapshot
+            return self._rebuild()
+
+    def invalidate(self) -> None:
+        """Rebuild on next use; the old snapshot is kept as a fallback."""
+        self._generation += 1
+        self._expires_at = 0.0
+
+    def _rebuild(self) -> ThreatContextSnapshot:
+        start = time.monotonic()
+        generation = self._generation
+        try:
+            threats = list(self.fetch_threats())
+        except Exception as e:
+            self._failures += 1
+            logger.warning(f"Failed to fetch threats for Cy context: {e}")
+            if self._snapshot is not None:
+                self._expires_at = start + min(self.ttl_seconds, FAILURE_RETRY_SECONDS)
+                return self._snapshot
+            self._snapshot = ThreatContextSnapshot(UNAVAILABLE_THREAT_CONTEXT, 0, 0, start, ok=False)
+            self._expires_at = start + FAILURE_RETRY_SECONDS
+            return self._snapshot
+
+        lines: List[str] = []
+        budget = self.max_tokens
+        for threat in threats:
+            line = format_threat_line(threat)
+            cost = count_tokens(line + "\n")
+            if cost > budget:
+                break
+            lines.append(line)
+            budget -= cost
+
+        text = "\n".join(lines) if lines else EMPTY_THREAT_CONTEXT
+        snapshot = ThreatContextSnapshot(text, len(threats), len(lines), start)
+        self._snapshot = snapshot
+        # If new data arrived while we were reading, rebuild again on next use
+        self._expires_at = start + self.ttl_seconds if generation == self._generation else 0.0
+        self._builds += 1
+        logger.info(f"Built threat context snapshot {snapshot.version}: {len(lines)}/{len(threats)} threats, ~{snapshot.tokens} tokens.")
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "snapshot": snapshot.describe() if snapshot is not None else None,
+            "fresh": self.current() is not None,
+            "ttl_seconds": self.ttl_seconds,
+            "max_tokens": self.max_tokens,
+            "builds": self._builds,
+            "failures": self._failures,
+        }
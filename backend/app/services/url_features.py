@@ -0,0 +1,162 @@
+import math
+import codecs
+import ipaddress
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from app.services.lru_cache import LRUCache
+
+# threatIntelligence types whose indicators are hostile infrastructure. Other
+# types (Vulnerability, Threat Intel) list advisory links, not bad hosts.
+MALICIOUS_THREAT_TYPES = {"Malware URL", "C2 Server", "Phishing", "Malware"}
+
+# Non-Latin letters that render like Latin ones (Cyrillic and Greek lookalikes)
+LATIN_LOOKALIKES = set("аеорсухіјѕԁԛԝһкӏ" + "οαρνυκιϲ")
+
+# Risk added to risk_score_base per URL
+SUSPICIOUS_URL_RISK = 0.2
+KNOWN_MALICIOUS_RISK = 0.3
+
+
+def parse_host(url: str) -> str:
+    """Lowercased host of a URL (or of a bare host), without port, credentials or trailing dot."""
+    candidate = url if "://" in url else f"http://{url}"
+    try:
+        host = urlsplit(candidate).hostname or ""
+    except ValueError:
+        host = ""
+    return host.rstrip(".")
+
+
+def is_ip_literal(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def decode_punycode(host: str) -> str:
+    labels = []
+    for label in host.split("."):
+        if label.startswith("xn--"):
+            try:
+                label = codecs.decode(label[4:].encode("ascii"), "punycode")
+            except (UnicodeError, ValueError):
+                pass
+        labels.append(label)
+    return ".".join(labels)
+
+
+def has_homoglyph(host: str) -> bool:
+    """
+    True if a label mixes scripts (e.g. Latin with Cyrillic) or is written
+    entirely in non-Latin characters that look like Latin letters.
+    """
+    for label in decode_punycode(host).split("."):
+        letters = [ch for ch in label if ch.isalpha()]
+        non_ascii = [ch for ch in letters if not ch.isascii()]
+        if not non_ascii:
+            continue
+        scripts = {"LATIN" if ch.isascii() else unicodedata.name(ch, "UNKNOWN").split(" ")[0] for ch in letters}
+        if len(scripts) > 1 or all(ch in LATIN_LOOKALIKES for ch in non_ascii):
+            return True
+    return False
+
+
+def host_entropy(host: str) -> float:
+    """Shannon entropy (bits per character) of the host without "www." and TLD; high for generated domains."""
+    labels = host.split(".")
+    if len(labels) > 1:
+        labels = labels[:-1]
+    if labels and labels[0] == "www":
+        labels = labels[1:]
+    name = "".join(labels)
+    if not name:
+        return 0.0
+    counts = Counter(name)
+    return sum((n / len(name)) * math.log2(len(name) / n) for n in counts.values())
+
+
+def indicator_host(indicator: Any) -> Optional[str]:
+    """Host named by a threat indicator (URL, domain, IP or email address), or None."""
+    value = str(indicator).strip().lower()
+    if not value or " " in value or value.startswith(("cve-", "port:", "asn")):
+        return None
+    if "@" in value and "://" not in value:
+        value = value.rsplit("@", 1)[1]
+    host = parse_host(value)
+    if not host or not (is_ip_literal(host) or "." in host):
+        return None
+    return host
+
+
+class UrlFeatureCache:
+    """
+    Per-host URL features for phishing signals.
+
+    Static features (IP literal, shortener, punycode, homoglyph, entropy) are
+    computed once per host and kept in a bounded LRU cache, since the same
+    domains recur across most traffic. Reputation comes from a set of hosts
+    seeded from threatIntelligence indicators; a host matches if it or any
+    parent domain is listed, so lookups stay O(labels).
+    """
+
+    def __init__(self, url_shorteners: Iterable[str], max_entries: int = 50000):
+        self.url_shorteners = {s.lower() for s in url_shorteners}
+        self.cache = LRUCache(max_entries)
+        self._malicious_hosts: frozenset = frozenset()
+        self._lock = threading.Lock()
+
+    def _host_matches(self, host: str, domains) -> bool:
+        if is_ip_literal(host):
+            return host in domains
+        labels = host.split(".")
+        return any(".".join(labels[i:]) in domains for i in range(len(labels)))
+
+    def _static_features(self, host: str) -> Dict[str, Any]:
+        features = self.cache.get(host)
+        if features is None:
+            features = {
+                "host": host,
+                "is_ip": is_ip_literal(host),
+                "is_shortened": self._host_matches(host, self.url_shorteners),
+                "punycode": any(label.startswith("xn--") for label in host.split(".")),
+                "homoglyph": has_homoglyph(host),
+                "entropy": round(host_entropy(host), 3),
+            }
+            self.cache.set(host, features)
+        return features
+
+    def features(self, url: str) -> Dict[str, Any]:
+        """Features for `url`, including whether our threat feed lists its host."""
+        host = parse_host(url)
+        features = dict(self._static_features(host))
+        features["known_malicious"] = bool(host) and self._host_matches(host, self._malicious_hosts)
+        features["suspicious"] = (features["is_ip"] or features["is_shortened"]
+                                  or features["homoglyph"] or features["known_malicious"])
+        return features
+
+    def add_indicators(self, indicators: Iterable[Any]) -> int:
+        """Add malicious hosts; returns how many were new."""
+        hosts = {host for host in (indicator_host(i) for i in indicators) if host}
+        with self._lock:
+            new_hosts = hosts - self._malicious_hosts
+            if new_hosts:
+                # Replace rather than mutate so readers never see a set mid-update
+                self._malicious_hosts = self._malicious_hosts | new_hosts
+        return len(new_hosts)
+
+    def add_threats(self, threats: Iterable[Dict[str, Any]]) -> int:
+        """Add indicators from threatIntelligence documents of hostile types."""
+        indicators = []
+        for threat in threats:
+            if threat.get("type") in MALICIOUS_THREAT_TYPES:
+                indicators.extend(threat.get("indicators") or [])
+        return self.add_indicators(indicators)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"known_malicious_hosts": len(self._malicious_hosts), **self.cache.stats()}
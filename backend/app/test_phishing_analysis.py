@@ -7,6 +7,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 try:
     from app.services.phishing_service import phishing_service
+    phishing_service.load_models()
     
     print("--- End-to-End Phishing Analysis Test ---")
     
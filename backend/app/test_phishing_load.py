@@ -6,15 +6,18 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 try:
     from app.services.phishing_service import phishing_service
+    phishing_service.load_models()
+    bundle = phishing_service.bundle
     
     print("--- Phishing Service Health Check ---")
-    print(f"Placeholder Mode: {phishing_service.placeholder_mode}")
-    print(f"Vectorizer Loaded: {phishing_service.vectorizer is not None}")
-    print(f"LogReg Loaded: {phishing_service.logreg is not None}")
-    print(f"SVM Loaded: {phishing_service.svm is not None}")
-    print(f"DistilBERT Loaded: {phishing_service.bert_model is not None}")
+    print(f"Model Version: {bundle.model_version}")
+    print(f"Placeholder Mode: {bundle.placeholder_mode}")
+    print(f"Vectorizer Loaded: {bundle.vectorizer is not None}")
+    print(f"LogReg Loaded: {bundle.logreg is not None}")
+    print(f"SVM Loaded: {bundle.svm is not None}")
+    print(f"DistilBERT Loaded: {bundle.bert_model is not None}")
     
-    if phishing_service.vectorizer and phishing_service.logreg and phishing_service.svm:
+    if bundle.vectorizer and bundle.logreg and bundle.svm:
         print("\nSUCCESS: Classic ML models loaded correctly.")
     else:
         print("\nFAILURE: One or more classic ML models failed to load.")
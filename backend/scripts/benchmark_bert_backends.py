@@ -0,0 +1,132 @@
+import sys
+import os
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+
+# Add the backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+DISTILBERT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app", "models", "distilbert-phishing"))
+ONNX_PATH = os.getenv("PHISHING_ONNX_PATH", os.path.join(DISTILBERT_DIR, "model.onnx"))
+
+SAMPLE_EMAILS = [
+    "URGENT: Your account has been suspended! Click here to verify your identity immediately: http://192.168.1.10/verify-login",
+    "Hi Team, the meeting has been rescheduled to tomorrow at 10 AM. See you there!",
+    "Your package could not be delivered. Confirm your address at http://bit.ly/3xYz to avoid return fees.",
+    "Attached is the quarterly report. Let me know if the numbers look right before Friday's review.",
+    "Security alert: unusual sign-in detected. Reset link: http://secure-login-update.com/reset. Last chance to keep access.",
+    "Reminder: the library will be closed on Monday for maintenance. Borrowed books are due Tuesday.",
+    "Dear customer, we need you to confirm identity and enter your PIN to release the pending wire transfer.",
+    "Thanks for the code review! I've pushed the fixes and rebased onto main.",
+]
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_backend(backend: str, repeats: int) -> dict:
+    """Load one backend in this process and measure it."""
+    import torch
+    from transformers import AutoTokenizer
+    # Imported directly so the classic models are not loaded into this process
+    from app.services.bert_backends import load_bert_backend
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(DISTILBERT_DIR)
+    model, active = load_bert_backend(backend, DISTILBERT_DIR, tokenizer, onnx_path=ONNX_PATH)
+    load_s = time.perf_counter() - start
+
+    def score(texts):
+        inputs = tokenizer(texts, return_tensors="pt", truncation=True, padding=True, max_length=128)
+        with torch.no_grad():
+            return torch.softmax(model(**inputs).logits, dim=1)[:, 1].tolist()
+
+    scores = score(SAMPLE_EMAILS)
+
+    single = []
+    for _ in range(repeats):
+        for text in SAMPLE_EMAILS:
+            t0 = time.perf_counter()
+            score([text])
+            single.append((time.perf_counter() - t0) * 1000)
+
+    batched = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        score(SAMPLE_EMAILS)
+        batched.append((time.perf_counter() - t0) * 1000 / len(SAMPLE_EMAILS))
+
+    return {
+        "requested_backend": backend,
+        "backend": active,
+        "load_seconds": round(load_s, 3),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "model_rss_mb": round(_rss_mb() - rss_before, 1),
+        "latency_ms_batch1_p50": round(statistics.median(single), 2),
+        "latency_ms_batch1_p95": round(sorted(single)[int(len(single) * 0.95) - 1], 2),
+        "latency_ms_per_email_batched": round(statistics.median(batched), 2),
+        "scores": scores
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare DistilBERT inference backends against fp32 torch")
+    parser.add_argument("--backend", help="Measure a single backend in this process and print JSON")
+    parser.add_argument("--backends", default="torch,int8,onnx", help="Comma-separated backends to compare")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Max allowed |score - fp32 score|")
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.repeats)))
+        return
+
+    print("--- DistilBERT Backend Benchmark ---")
+    results = {}
+    backends = ["torch"] + [b for b in args.backends.split(",") if b and b != "torch"]
+    for backend in backends:
+        # Each backend runs in a fresh process so memory numbers are not shared
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--backend", backend, "--repeats", str(args.repeats)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"[{backend}] failed:\n{proc.stderr[-2000:]}")
+            continue
+        results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    if "torch" not in results:
+        print("FAILURE: fp32 torch baseline could not be measured.")
+        sys.exit(1)
+
+    baseline = results["torch"]["scores"]
+    parity_ok = True
+    for backend, res in results.items():
+        diffs = [abs(a - b) for a, b in zip(res["scores"], baseline)]
+        flips = sum((a > 0.5) != (b > 0.5) for a, b in zip(res["scores"], baseline))
+        res["max_abs_diff"] = round(max(diffs), 5)
+        res["label_flips"] = flips
+        if res["max_abs_diff"] > args.tolerance:
+            parity_ok = False
+        print(f"\n[{backend}] (active: {res['backend']})")
+        print(f"  load: {res['load_seconds']}s, model RSS: {res['model_rss_mb']} MB, peak RSS: {res['peak_rss_mb']} MB")
+        print(f"  batch=1 latency p50/p95: {res['latency_ms_batch1_p50']} / {res['latency_ms_batch1_p95']} ms")
+        print(f"  batched latency per email: {res['latency_ms_per_email_batched']} ms")
+        print(f"  parity vs fp32: max |diff| {res['max_abs_diff']}, label flips {flips}")
+
+    if parity_ok:
+        print(f"\nSUCCESS: all backends within {args.tolerance} of fp32 scores.")
+    else:
+        print(f"\nFAILURE: at least one backend differs from fp32 by more than {args.tolerance}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import sys
+import os
+import time
+import random
+import argparse
+
+# Add the backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bs4 import BeautifulSoup
+from app.services.html_text import html_to_text
+
+HEAD = (
+    "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Your weekly deals</title>"
+    "<style>.btn{color:#fff;background:#e33}table{width:100%}</style>"
+    "<script>window.dataLayer=window.dataLayer||[];function t(){return '<p>';}</script></head><body>"
+)
+BLOCKS = [
+    "<table class=\"row\"><tr><td><h2>Save 40% today &amp; tomorrow</h2><p>Limited&nbsp;offer on <b>all</b> items.</p></td></tr></table>",
+    "<div class=\"cta\"><a class=\"btn\" href=\"https://shop.example.com/deals?utm_source=mail\">Shop now &rarr;</a></div>",
+    "<p>Your account needs attention. <a href=\"http://198.51.100.23/verify\">Verify here</a> to avoid suspension.</p>",
+    "<!-- tracking pixel --><img src=\"https://t.example.com/p.gif\" width=\"1\" height=\"1\" alt=\"\">",
+    "<ul><li>Free shipping</li><li>30-day returns</li><li>24/7 support &#x2014; always</li></ul>",
+    "<p style=\"font-size:11px\">You received this email because you signed up. <a href=\"https://bit.ly/unsub\">Unsubscribe</a>.</p>",
+]
+TAIL = "</body></html>"
+
+
+def build_corpus(count, size, seed=5):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        parts = [HEAD]
+        length = len(HEAD)
+        while length < size:
+            block = rng.choice(BLOCKS)
+            parts.append(block)
+            length += len(block)
+        parts.append(TAIL)
+        corpus.append("".join(parts))
+    return corpus
+
+
+def bs4_text(markup):
+    return BeautifulSoup(markup, "html.parser").get_text()
+
+
+def time_it(fn, corpus, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for markup in corpus:
+            fn(markup)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000 / len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BeautifulSoup get_text() with the streaming HTML stripper")
+    parser.add_argument("--emails", type=int, default=30)
+    parser.add_argument("--sizes", default="2000,10000,50000", help="Approximate email sizes in characters")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print("--- HTML Stripping Benchmark ---")
+    mismatches = 0
+    for size in [int(s) for s in args.sizes.split(",")]:
+        corpus = build_corpus(args.emails, size)
+        for markup in corpus:
+            text, links = html_to_text(markup)
+            if text != bs4_text(markup):
+                mismatches += 1
+            if not links:
+                print("FAILURE: no link targets recovered from a document containing anchors.")
+                sys.exit(1)
+
+        bs4_ms = time_it(bs4_text, corpus, args.repeats)
+        stream_ms = time_it(html_to_text, corpus, args.repeats)
+        print(f"[{size} chars x {args.emails} emails] BeautifulSoup {bs4_ms:.3f} ms/email, streaming {stream_ms:.3f} ms/email ({bs4_ms / stream_ms:.1f}x)")
+
+    if mismatches:
+        print(f"\nFAILURE: {mismatches} documents produced different text.")
+        sys.exit(1)
+    print("\nSUCCESS: streaming stripper text matches BeautifulSoup get_text().")
+
+
+if __name__ == "__main__":
+    main()
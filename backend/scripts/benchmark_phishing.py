@@ -0,0 +1,252 @@
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Add the backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.phishing_service import phishing_service
+from app.services.lru_cache import LRUCache
+
+SIZE_BUCKETS = {
+    "small": 500,
+    "medium": 5000,
+    "large": 20000,
+    "xlarge": 50000,
+}
+
+PLAIN_PARAGRAPHS = [
+    "Hi team, the quarterly planning meeting has moved to Thursday at 2 PM. Please bring your updated roadmaps.",
+    "URGENT: your mailbox storage is full and incoming messages will be suspended. Action required immediately.",
+    "Please verify your password within 24 hours at http://192.168.10.5/owa/login to keep your account active.",
+    "Thanks for your order! Your package ships tomorrow and you can track it from your account page.",
+    "Security warning: we detected an unusual sign-in. Use this reset link http://bit.ly/2Fx9 to secure login.",
+    "The library will be closed on Monday for maintenance. Borrowed items are due back by Wednesday.",
+]
+HTML_BLOCKS = [
+    "<table><tr><td><h2>Exclusive offer &amp; savings</h2><p>Up to <b>60%</b> off selected items this weekend.</p></td></tr></table>",
+    "<p>Your account has been <strong>suspended</strong>. <a href=\"http://198.51.100.7/verify\">Click here</a> to restore access.</p>",
+    "<style>.footer{font-size:10px;color:#999}</style><div class=\"footer\">You are receiving this because you subscribed.</div>",
+    "<p>Meeting notes are attached. <a href=\"https://docs.example.com/notes\">Open the document</a> before Friday.</p>",
+]
+
+
+def build_corpus(per_bucket, seed=42):
+    """Synthetic plain-text and HTML emails for each size bucket."""
+    rng = random.Random(seed)
+    corpus = {}
+    for bucket, size in SIZE_BUCKETS.items():
+        emails = []
+        for i in range(per_bucket):
+            html = i % 2 == 1
+            parts = ["<html><body>"] if html else []
+            length = 0
+            while length < size:
+                piece = rng.choice(HTML_BLOCKS) if html else rng.choice(PLAIN_PARAGRAPHS) + "\n"
+                parts.append(piece)
+                length += len(piece)
+            if html:
+                parts.append("</body></html>")
+            emails.append("".join(parts)[:50000])
+        corpus[bucket] = emails
+    return corpus
+
+
+def load_corpus_file(path):
+    """One email per line as JSON ({"email_text": ...}) or plain text; bucketed by size."""
+    corpus = {bucket: [] for bucket in SIZE_BUCKETS}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            try:
+                text = json.loads(line).get("email_text", "")
+            except (json.JSONDecodeError, AttributeError):
+                text = line
+            bucket = next((b for b, size in SIZE_BUCKETS.items() if len(text) <= size), "xlarge")
+            corpus[bucket].append(text[:50000])
+    return {bucket: emails for bucket, emails in corpus.items() if emails}
+
+
+def summarize(samples_ms):
+    if not samples_ms:
+        return None
+    ordered = sorted(samples_ms)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def measure_stages(emails):
+    """Per-email latency of each pipeline stage, run one email at a time."""
+    service = phishing_service
+    bundle = service.bundle
+    stages = {name: [] for name in ("strip_html", "extract_signals", "tfidf", "logreg", "svm", "distilbert")}
+    for email_text in emails:
+        (clean_text, links), ms = timed(service.html_to_text, email_text)
+        stages["strip_html"].append(ms)
+        _, ms = timed(service.extract_signals, service._signal_text(clean_text, links))
+        stages["extract_signals"].append(ms)
+
+        if bundle.classic_ready:
+            vectorized, ms = timed(bundle.vectorizer.transform, [clean_text])
+            stages["tfidf"].append(ms)
+            _, ms = timed(bundle.logreg.predict_proba, vectorized)
+            stages["logreg"].append(ms)
+            svm_fn = bundle.svm.predict_proba if hasattr(bundle.svm, "predict_proba") else bundle.svm.decision_function
+            _, ms = timed(svm_fn, vectorized)
+            stages["svm"].append(ms)
+
+        if bundle.bert_ready:
+            _, ms = timed(service._score_bert_batch, bundle, [clean_text])
+            stages["distilbert"].append(ms)
+
+    return {name: summarize(samples) for name, samples in stages.items()}
+
+
+def measure_throughput(emails, concurrency, rounds):
+    """End-to-end analyze_email throughput with `concurrency` callers."""
+    jobs = emails * rounds
+    latencies = []
+
+    def run(email_text):
+        _, ms = timed(phishing_service.analyze_email, email_text)
+        latencies.append(ms)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run, jobs))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "emails": len(jobs),
+        "elapsed_s": round(elapsed, 3),
+        "emails_per_s": round(len(jobs) / elapsed, 2) if elapsed else None,
+        "latency": summarize(latencies),
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return regressions where p95 latency or throughput is worse than baseline by more than `tolerance`."""
+    regressions = []
+    for bucket, current in results["buckets"].items():
+        previous = baseline.get("buckets", {}).get(bucket)
+        if not previous:
+            continue
+        for name, summary in current["stages"].items():
+            old = previous["stages"].get(name)
+            if summary and old and summary["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{bucket}/{name}: p95 {old['p95_ms']} ms -> {summary['p95_ms']} ms")
+        old_runs = {run["concurrency"]: run for run in previous["throughput"]}
+        for run in current["throughput"]:
+            old = old_runs.get(run["concurrency"])
+            if old and old["emails_per_s"] and run["emails_per_s"] < old["emails_per_s"] * (1 - tolerance):
+                regressions.append(
+                    f"{bucket}/concurrency {run['concurrency']}: {old['emails_per_s']} -> {run['emails_per_s']} emails/s"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PhishingService stages and end-to-end throughput")
+    parser.add_argument("--per-bucket", type=int, default=20, help="Synthetic emails per size bucket")
+    parser.add_argument("--corpus", help="Optional corpus file (JSON lines with email_text, or one email per line)")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over each bucket per concurrency level")
+    parser.add_argument("--placeholder", action="store_true", help="Skip model loading and benchmark the heuristic path")
+    parser.add_argument("--output", default=None, help="JSON results path (default: bench_results/phishing_<timestamp>.json)")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown versus baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    print("--- Phishing Analyzer Benchmark ---")
+    # Without loaded models the service scores with its placeholder heuristic
+    if not args.placeholder:
+        phishing_service.load_models()
+    # Measure the models, not the result cache
+    phishing_service.result_cache = LRUCache(0)
+
+    corpus = load_corpus_file(args.corpus) if args.corpus else build_corpus(args.per_bucket)
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+
+    bundle = phishing_service.bundle
+    results = {
+        "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "service": {
+            "model_version": bundle.model_version,
+            "placeholder_mode": bundle.model_version == "placeholder",
+            "classic_ready": bundle.classic_ready,
+            "bert_ready": bundle.bert_ready,
+            "bert_backend": bundle.bert_backend,
+            "bert_window_mode": phishing_service.BERT_WINDOW_MODE,
+            "microbatch": bundle.bert_batcher is not None,
+            "cascade": phishing_service.CASCADE_ENABLED,
+        },
+        "buckets": {},
+    }
+
+    for bucket, emails in corpus.items():
+        print(f"\n[{bucket}] {len(emails)} emails, avg {sum(map(len, emails)) // len(emails)} chars")
+        stages = measure_stages(emails)
+        for name, summary in stages.items():
+            if summary:
+                print(f"  {name:<16} p50 {summary['p50_ms']:>9.3f} ms   p95 {summary['p95_ms']:>9.3f} ms")
+        throughput = []
+        for level in levels:
+            run = measure_throughput(emails, level, args.rounds)
+            throughput.append(run)
+            print(f"  concurrency {level:<3} {run['emails_per_s']:>9} emails/s   p99 {run['latency']['p99_ms']} ms")
+        results["buckets"][bucket] = {
+            "emails": len(emails),
+            "avg_chars": sum(map(len, emails)) // len(emails),
+            "stages": stages,
+            "throughput": throughput,
+        }
+
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "..", "bench_results",
+        f"phishing_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {os.path.abspath(output)}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nFAILURE: {len(regressions)} regressions beyond {args.tolerance:.0%} of baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nSUCCESS: no regressions beyond {args.tolerance:.0%} of baseline.")
+
+
+if __name__ == "__main__":
+    main()
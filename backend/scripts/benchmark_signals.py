@@ -0,0 +1,120 @@
+import sys
+import os
+import re
+import time
+import random
+import argparse
+
+# Add the backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.signal_matcher import (
+    SignalMatcher,
+    DEFAULT_URGENT_KEYWORDS,
+    DEFAULT_CREDENTIAL_KEYWORDS,
+    DEFAULT_URL_SHORTENERS,
+)
+from app.services.url_features import UrlFeatureCache
+
+FILLER = (
+    "Dear valued customer, thank you for being part of our community. Our team reviewed the quarterly "
+    "statements and we are happy to share the latest product updates with you. "
+)
+FRAGMENTS = [
+    "URGENT: action required on your account. ",
+    "Please verify your password within 24 hours. ",
+    "Visit https://www.example.com/help for support. ",
+    "Click http://192.168.4.20/login to continue. ",
+    "Shortened link: http://bit.ly/3kX9aQ ",
+    "<a href=\"https://secure-login.example.net/reset\">reset link</a> ",
+    "This is your last chance before the account is closed. ",
+]
+
+
+def legacy_scan(text, urgent_keywords, credential_keywords, shorteners):
+    """The per-keyword, substring-flag implementation that SignalMatcher and UrlFeatureCache replace."""
+    urls = re.findall(r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+', text)
+    urgent = [kw for kw in urgent_keywords if kw.lower() in text.lower()]
+    credentials = [kw for kw in credential_keywords if kw.lower() in text.lower()]
+    flags = [(re.search(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', u) is not None, any(s in u for s in shorteners)) for u in urls]
+    return urls, urgent, credentials, flags
+
+
+def matcher_scan(matcher, url_features, text):
+    """What PhishingService does now: one matcher pass, then cached per-host URL features."""
+    urls, urgent, credentials = matcher.scan(text)
+    flags = [(f["is_ip"], f["is_shortened"]) for f in map(url_features.features, urls)]
+    return urls, urgent, credentials, flags
+
+
+def same_signals(legacy, current):
+    # URL flags are not compared: the host-based IP and shortener checks
+    # deliberately differ from the old substring tests (e.g. "t.co" in "microsoft.com")
+    return legacy[:3] == current[:3]
+
+
+def build_corpus(count, size, seed=7):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        parts = []
+        while sum(len(p) for p in parts) < size:
+            parts.append(rng.choice(FRAGMENTS) if rng.random() < 0.15 else FILLER)
+        corpus.append("".join(parts)[:size])
+    return corpus
+
+
+def time_it(fn, corpus, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000 / len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark phishing signal extraction on large emails")
+    parser.add_argument("--emails", type=int, default=50)
+    parser.add_argument("--sizes", default="2000,10000,50000", help="Email sizes in characters")
+    parser.add_argument("--extra-keywords", type=int, default=500, help="Synthetic keywords for the scaling run")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print("--- Phishing Signal Extraction Benchmark ---")
+    matcher = SignalMatcher(DEFAULT_URGENT_KEYWORDS, DEFAULT_CREDENTIAL_KEYWORDS, DEFAULT_URL_SHORTENERS)
+    url_features = UrlFeatureCache(DEFAULT_URL_SHORTENERS)
+
+    # Larger keyword list to show how each approach scales with list size
+    rng = random.Random(11)
+    extra = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(6, 14))) for _ in range(args.extra_keywords)]
+    big_urgent = DEFAULT_URGENT_KEYWORDS + extra
+    big_matcher = SignalMatcher(big_urgent, DEFAULT_CREDENTIAL_KEYWORDS, DEFAULT_URL_SHORTENERS)
+
+    mismatches = 0
+    for size in [int(s) for s in args.sizes.split(",")]:
+        corpus = build_corpus(args.emails, size)
+        for text in corpus:
+            if not same_signals(legacy_scan(text, DEFAULT_URGENT_KEYWORDS, DEFAULT_CREDENTIAL_KEYWORDS, DEFAULT_URL_SHORTENERS), matcher_scan(matcher, url_features, text)):
+                mismatches += 1
+            if not same_signals(legacy_scan(text, big_urgent, DEFAULT_CREDENTIAL_KEYWORDS, DEFAULT_URL_SHORTENERS), matcher_scan(big_matcher, url_features, text)):
+                mismatches += 1
+
+        legacy_ms = time_it(lambda t: legacy_scan(t, DEFAULT_URGENT_KEYWORDS, DEFAULT_CREDENTIAL_KEYWORDS, DEFAULT_URL_SHORTENERS), corpus, args.repeats)
+        matcher_ms = time_it(lambda t: matcher_scan(matcher, url_features, t), corpus, args.repeats)
+        legacy_big_ms = time_it(lambda t: legacy_scan(t, big_urgent, DEFAULT_CREDENTIAL_KEYWORDS, DEFAULT_URL_SHORTENERS), corpus, args.repeats)
+        matcher_big_ms = time_it(lambda t: matcher_scan(big_matcher, url_features, t), corpus, args.repeats)
+
+        print(f"\n[{size} chars x {args.emails} emails]")
+        print(f"  default lists : legacy {legacy_ms:.3f} ms/email, compiled {matcher_ms:.3f} ms/email ({legacy_ms / matcher_ms:.1f}x)")
+        print(f"  +{args.extra_keywords} keywords: legacy {legacy_big_ms:.3f} ms/email, compiled {matcher_big_ms:.3f} ms/email ({legacy_big_ms / matcher_big_ms:.1f}x)")
+
+    if mismatches:
+        print(f"\nFAILURE: {mismatches} emails produced different signals.")
+        sys.exit(1)
+    print("\nSUCCESS: compiled matcher URLs and keywords match the legacy extractor.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import sys
+import os
+
+# Add the backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.phishing_service import PhishingService
+from app.services.shared_weights import export_joblib, export_torch_mmap
+
+def export_shared_models():
+    """
+    Pre-build the memory-mappable model files used with PHISHING_MODEL_MMAP=true,
+    so workers do not race to convert them on their first start.
+    """
+    print("--- Exporting Shared Phishing Models ---")
+
+    for path in (PhishingService.TFIDF_PATH, PhishingService.LOGREG_PATH, PhishingService.SVM_PATH):
+        if os.path.exists(path):
+            print(f"{os.path.basename(path)} -> {export_joblib(path)}")
+        else:
+            print(f"Skipping {path} (not found)")
+
+    if os.path.exists(PhishingService.DISTILBERT_DIR):
+        print(f"distilbert-phishing -> {export_torch_mmap(PhishingService.DISTILBERT_DIR)}")
+    else:
+        print(f"Skipping {PhishingService.DISTILBERT_DIR} (not found)")
+
+    print("--- Export Complete ---")
+
+if __name__ == "__main__":
+    export_shared_models()
@@ -1,44 +1,65 @@
 import sys
 import os
-import asyncio
+import argparse
 
 # Add the backend directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from app.services.cy_service import cy_service
 
-async def ingest_sample_content():
+SAMPLE_DOCS = [
+    {
+        "content": "CodeLife is an advanced cybersecurity training platform. It features interactive labs, a phishing analyzer, and an AI tutor named Cy.",
+        "metadata": {"title": "About CodeLife", "type": "overview"}
+    },
+    {
+        "content": "To start a lab, navigate to the Dashboard and click on 'Start Lab'. You will be given a Docker-based terminal environment.",
+        "metadata": {"title": "How to Start a Lab", "type": "guide"}
+    },
+    {
+        "content": "Phishing detection uses an ensemble of TF-IDF, Logistic Regression, SVM, and DistilBERT to analyze emails for suspicious signals.",
+        "metadata": {"title": "Phishing Analyzer Logic", "type": "technical"}
+    }
+]
+
+
+def print_progress(progress):
+    p = progress.as_dict()
+    print(f"  {p['documents']} documents, {p['chunks']} chunks "
+          f"({p['added']} added, {p['skipped_unchanged']} unchanged) "
+          f"- {p['chunks_per_second']} chunks/s", flush=True)
+
+
+def ingest_content(directory=None):
     print("--- Starting Content Ingestion ---")
-    
-    sample_docs = [
-        {
-            "content": "CodeLife is an advanced cybersecurity training platform. It features interactive labs, a phishing analyzer, and an AI tutor named Cy.",
-            "metadata": {"title": "About CodeLife", "type": "overview"}
-        },
-        {
-            "content": "To start a lab, navigate to the Dashboard and click on 'Start Lab'. You will be given a Docker-based terminal environment.",
-            "metadata": {"title": "How to Start a Lab", "type": "guide"}
-        },
-        {
-            "content": "Phishing detection uses an ensemble of TF-IDF, Logistic Regression, SVM, and DistilBERT to analyze emails for suspicious signals.",
-            "metadata": {"title": "Phishing Analyzer Logic", "type": "technical"}
-        }
-    ]
-
-    for doc in sample_docs:
-        print(f"Ingesting: {doc['metadata']['title']}")
-        cy_service.add_document(doc["content"], doc["metadata"])
-    
-    print("--- Ingestion Complete ---")
-    
+
+    # Documents indexed before content-hash ids would otherwise be duplicated
+    migrated = cy_service.ingestor.migrate_legacy()
+    if migrated["legacy"]:
+        print(f"Migrated legacy documents: {migrated}")
+
+    if directory:
+        print(f"Streaming markdown/text files from {directory}")
+        report = cy_service.ingestor.ingest_directory(directory, on_progress=print_progress)
+    else:
+        for doc in SAMPLE_DOCS:
+            print(f"Ingesting: {doc['metadata']['title']}")
+        report = cy_service.ingestor.ingest(
+            [(doc["content"], doc["metadata"]) for doc in SAMPLE_DOCS], on_progress=print_progress
+        )
+
+    print(f"--- Ingestion Complete: {report} ---")
+
     # Verify
     print("\n--- Verifying Retrieval ---")
     query = "How does the phishing analyzer work?"
     results = cy_service.search_context(query)
     for r in results:
-        print(f"Found: {r.metadata['title']} \nContent: {r.page_content[:50]}...")
+        print(f"Found: {r.metadata.get('title')} \nContent: {r.page_content[:50]}...")
+
 
 if __name__ == "__main__":
-    # ChromaDB operations are synchronous in this setup, so we can just run the function
-    # But if we had async DB ops, we'd need asyncio.run
-    asyncio.run(ingest_sample_content())
+    parser = argparse.ArgumentParser(description="Index content into Cy's knowledge base")
+    parser.add_argument("directory", nargs="?", help="Directory of .md/.txt files (default: built-in sample documents)")
+    args = parser.parse_args()
+    ingest_content(args.directory)
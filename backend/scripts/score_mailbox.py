@@ -0,0 +1,51 @@
+import sys
+import os
+import json
+import time
+import argparse
+from collections import Counter
+
+# Add the backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.phishing_service import phishing_service
+from app.services.mail_ingest import BATCH_SIZE, iter_mail_sources, iter_record_batches, result_lines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score mbox archives and/or directories of .eml files, writing one NDJSON line per message"
+    )
+    parser.add_argument("paths", nargs="+", help="mbox files or directories containing .eml files")
+    parser.add_argument("--output", "-o", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--no-strip-html", action="store_true", help="Score raw message bodies without stripping HTML")
+    parser.add_argument("--placeholder", action="store_true", help="Skip model loading and use the heuristic scorer")
+    args = parser.parse_args()
+
+    # Without loaded models the service scores with its placeholder heuristic
+    if not args.placeholder:
+        phishing_service.load_models()
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    counts = Counter()
+    start = time.perf_counter()
+    try:
+        for batch in iter_record_batches(iter_mail_sources(args.paths), args.batch_size):
+            results = phishing_service.analyze_batch([record["text"] for record in batch], strip_html=not args.no_strip_html)
+            for line in result_lines(batch, results):
+                out.write(json.dumps(line) + "\n")
+                counts[line["result"]["classification"]] += 1
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Scored {total} messages in {elapsed:.1f}s ({rate:.1f} msg/s): {dict(counts)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
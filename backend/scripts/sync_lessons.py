@@ -0,0 +1,29 @@
+import sys
+import os
+
+# Add the backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import app.firebase_admin  # initializes firebase_admin with the service account
+from app.services.cy_service import cy_service
+
+
+def main():
+    print("--- Syncing Firestore lessons into Cy's knowledge base ---")
+    # Guarded, so this never races a sync already running in the server
+    report = cy_service.lesson_sync.run_guarded()
+    if report is None:
+        error = cy_service.lesson_sync.status["last_error"]
+        if error:
+            print(f"FAILURE: Lesson sync failed: {error}")
+        else:
+            print("FAILURE: A lesson sync is already running; try again when it finishes")
+        sys.exit(1)
+    print(f"Lessons: {report['lessons']} | added: {report['added']} | re-indexed: {report['reindexed']} | "
+          f"metadata only: {report['metadata_only']} | unchanged: {report['unchanged']} | removed: {report['removed']}")
+    print(f"Chunks embedded: {report['chunks_added']} in {report['elapsed_seconds']}s")
+    print("SUCCESS: Lesson sync complete")
+
+
+if __name__ == "__main__":
+    main()